@@ -0,0 +1,197 @@
+"""AI Studio 中转 API 共享客户端
+
+所有 scripts/verify_* 脚本通过本模块访问 API:
+- 同一个 requests.Session 复用 keep-alive 连接池,避免每次请求重新握手
+- 按接口类型设置 (连接, 读取) 超时
+- 429/5xx 按指数退避重试(任务提交只重试 429,避免重复扣费);
+  连接异常时,提交和上传只在连接根本没建立(连接超时、建连失败)时重试
+- 基础地址和 API Key 统一从环境变量读取,代码中不保存 key;AI_STUDIO_API_KEYS 配置多个 key 时
+  get_client() 返回 key_pool.KeyPool,按负载把提交分摊到各个 key
+- 可选的 RateLimiter:除余额查询外的所有请求先取令牌
+- instrumentation 开启时记录每次请求、建连和限流等待的耗时
+"""
+
+import os
+import time
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+import instrumentation
+from instrumentation import TimedHTTPAdapter
+from rate_limiter import RateLimiter
+
+BASE_URL = os.environ.get("AI_STUDIO_BASE_URL", "https://openapi.ai-studio.me").rstrip("/")
+API_KEY = os.environ.get("AI_STUDIO_API_KEY")
+
+# 各生成类型支持的平台(见 API 对接文档「平台支持列表」)
+PLATFORMS = {
+    "images": ("grok", "dreamina", "kling", "lovart", "krea"),
+    "videos": ("sora", "dreamina", "kling", "hailuo", "higgsfield", "heygen", "krea"),
+    "music": ("suno",),
+}
+
+# 各类接口的 (连接超时, 读取超时),单位秒
+TIMEOUTS = {
+    "submit": (5, 30),
+    "task": (5, 15),
+    "balance": (5, 10),
+    "consumption": (5, 30),
+    "upload": (10, 300),
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 提交接口非幂等:5xx 时上游可能已建任务,只对 429 重试
+NON_IDEMPOTENT = {"submit", "upload"}
+
+# 余额接口用于刷新限流配额,本身不经过限流器
+UNLIMITED = {"balance"}
+
+
+class ApiClient:
+    """带连接池、超时和重试的 API 客户端"""
+
+    def __init__(self, api_key=None, base_url=None, pool_size=20,
+                 max_retries=3, backoff=1.0, timeouts=None, rate_limiter=None):
+        self.api_key = api_key or API_KEY
+        if not self.api_key:
+            raise ValueError("未配置 API Key:请设置环境变量 AI_STUDIO_API_KEY,"
+                             "多个 key 用逗号分隔写入 AI_STUDIO_API_KEYS")
+        self.base_url = (base_url or BASE_URL).rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeouts = {**TIMEOUTS, **(timeouts or {})}
+        self.rate_limiter = rate_limiter
+        if rate_limiter is not None and rate_limiter.source is None:
+            rate_limiter.source = self
+
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Authorization": f"Bearer {self.api_key}"})
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def request(self, endpoint, path, json=None, files=None, data=None, headers=None, max_retries=None):
+        """发送 POST 请求,按 endpoint 选择超时和重试策略,返回最后一次的 Response
+
+        max_retries: 覆盖实例的重试次数,例如由调用方自行换 key 重试时传 0
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        timeout = self.timeouts.get(endpoint, self.timeouts["task"])
+        retry_on = {429} if endpoint in NON_IDEMPOTENT else RETRY_STATUS
+        if files is None and data is None:
+            headers = {"Content-Type": "application/json", **(headers or {})}
+
+        limiter = None if endpoint in UNLIMITED else self.rate_limiter
+
+        attempt = 0
+        while True:
+            rec = instrumentation.recorder
+            if limiter is not None:
+                if rec is None:
+                    limiter.acquire()
+                else:
+                    start = time.perf_counter()
+                    limiter.acquire()
+                    rec.throttled(endpoint, path, time.perf_counter() - start)
+            if hasattr(data, "seek"):
+                # 流式请求体在重试前需要回到开头
+                data.seek(0)
+            if rec is not None:
+                start = time.perf_counter()
+            try:
+                response = self.session.post(
+                    self.url(path), json=json, files=files, data=data,
+                    headers=headers, timeout=timeout,
+                )
+            except requests.ConnectionError as e:
+                if rec is not None:
+                    rec.request(endpoint, path, json, None, time.perf_counter() - start, attempt, type(e).__name__)
+                # "Connection aborted"/RemoteDisconnected 也是 ConnectionError,但请求可能已经送达
+                # (复用 keep-alive 连接时常见);非幂等接口只在连接没建立起来时重试
+                if attempt >= max_retries or (endpoint in NON_IDEMPOTENT and not _never_sent(e)):
+                    raise
+            else:
+                if rec is not None:
+                    rec.request(endpoint, path, json, response, time.perf_counter() - start, attempt)
+                if response.status_code not in retry_on or attempt >= max_retries:
+                    return response
+                delay = _retry_after(response)
+                response.close()
+                if limiter is not None and response.status_code == 429:
+                    limiter.throttled(delay)
+                    delay = 0.0
+                if delay is not None:
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+            time.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+
+    def create_task(self, platform, kind, payload):
+        """创建生成任务,kind 为 images / videos / music"""
+        return self.request("submit", f"/api/{platform}/{kind}", json=payload)
+
+    def query_task(self, platform, task_id):
+        """查询任务状态"""
+        return self.request("task", f"/api/{platform}/tasks", json={"task_id": task_id})
+
+    def balance(self):
+        """查询账户余额和限流信息"""
+        return self.request("balance", "/api/account/balance")
+
+    def consumption(self, start_date=None, end_date=None, platform=None, **extra):
+        """查询消费记录,extra 原样附加到请求体(如分页参数)"""
+        payload = {k: v for k, v in (("start_date", start_date), ("end_date", end_date),
+                                      ("platform", platform), *extra.items()) if v}
+        return self.request("consumption", "/api/account/consumption", json=payload)
+
+    def upload_file(self, files):
+        """上传文件,files 与 requests 的 files 参数格式相同"""
+        return self.request("upload", "/api/upload/file", files=files)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _never_sent(error):
+    """连接超时或建连失败:请求肯定没有发出"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+_default_client = None
+
+
+def get_client():
+    """返回进程内共享的默认客户端,限流配额在首次请求时从余额接口获取"""
+    global _default_client
+    if _default_client is None:
+        keys = [k.strip() for k in os.environ.get("AI_STUDIO_API_KEYS", "").split(",") if k.strip()]
+        if len(keys) > 1:
+            # key_pool 依赖本模块,只能在这里导入
+            from key_pool import KeyPool
+            _default_client = KeyPool.from_env()
+        else:
+            _default_client = ApiClient(api_key=keys[0] if keys else None, rate_limiter=RateLimiter())
+    return _default_client
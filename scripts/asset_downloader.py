@@ -0,0 +1,246 @@
+"""并发、流式、可断点续传的生成结果下载器
+
+输入为已完成任务的结果(batch_runner 输出的 JSONL,或带 asset_urls 的记录),
+按有限并发下载所有资源:
+- 分块写入 <文件>.part,不把整个文件读进内存,完成后再改名
+- 已有 .part 时用 HTTP Range 续传,服务端不支持 Range 时从头下载
+- 校验 Content-Length / Content-Range 给出的大小和 Content-Type
+- 按 URL 和内容 sha256 去重,索引保存在目标目录的 .download_index.json
+
+用法:
+    python scripts/asset_downloader.py scripts/batch_results.jsonl -d downloads
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+
+import instrumentation
+from instrumentation import TimedHTTPAdapter
+
+CHUNK_SIZE = 1024 * 1024
+INDEX_FILE = ".download_index.json"
+
+# 扩展名 -> 允许的 Content-Type 前缀
+EXPECTED_TYPES = {
+    ".png": ("image/",), ".jpg": ("image/",), ".jpeg": ("image/",), ".webp": ("image/",), ".gif": ("image/",),
+    ".mp4": ("video/",), ".mov": ("video/",), ".webm": ("video/",),
+    ".mp3": ("audio/",), ".wav": ("audio/",), ".m4a": ("audio/",),
+}
+# CDN 常见的通用类型,不视为类型不符
+GENERIC_TYPES = ("application/octet-stream", "binary/octet-stream")
+
+
+class DownloadError(Exception):
+    """下载或校验失败"""
+
+
+class DownloadResult:
+    """单个资源的下载结果"""
+
+    __slots__ = ("url", "path", "size", "sha256", "status", "resumed_from", "elapsed", "error")
+
+    def __init__(self, url, path=None, size=0, sha256=None, status="downloaded",
+                 resumed_from=0, elapsed=0.0, error=None):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.status = status
+        self.resumed_from = resumed_from
+        self.elapsed = elapsed
+        self.error = error
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class AssetDownloader:
+    """资源下载器,同一实例内的下载共享连接池和去重索引"""
+
+    def __init__(self, dest_dir, concurrency=4, timeout=(10, 60), chunk_size=CHUNK_SIZE):
+        self.dest_dir = dest_dir
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        os.makedirs(dest_dir, exist_ok=True)
+
+        # 资源在 CDN 上,不能带 API Key,使用独立的 Session
+        self.session = requests.Session()
+        adapter = TimedHTTPAdapter(pool_connections=4, pool_maxsize=concurrency, max_retries=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(dest_dir, INDEX_FILE)
+        self.index = {"urls": {}, "hashes": {}}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+
+    def _save_index(self):
+        tmp = f"{self._index_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self._index_path)
+
+    def target_path(self, url, name=None):
+        ext = posixpath.splitext(urlparse(url).path)[1].lower()
+        name = name or hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.dest_dir, f"{name}{ext}")
+
+    def download(self, url, name=None):
+        """下载单个 URL,返回 DownloadResult;失败时 status 为 failed"""
+        start = time.monotonic()
+        with self._lock:
+            known = self.index["urls"].get(url)
+        if known and os.path.exists(known["path"]):
+            return DownloadResult(url, known["path"], known["size"], known["sha256"], status="cached")
+
+        path = self.target_path(url, name)
+        try:
+            size, digest, resumed_from = self._fetch(url, path)
+        except (DownloadError, requests.RequestException, OSError) as e:
+            return DownloadResult(url, path, status="failed", elapsed=time.monotonic() - start, error=str(e))
+
+        status = "downloaded"
+        with self._lock:
+            existing = self.index["hashes"].get(digest)
+            if existing and existing != path and os.path.exists(existing):
+                # 内容相同的文件已经存在,删除新文件,指向已有文件
+                os.remove(path)
+                path = existing
+                status = "duplicate"
+            else:
+                self.index["hashes"][digest] = path
+            self.index["urls"][url] = {"path": path, "size": size, "sha256": digest}
+            self._save_index()
+        elapsed = time.monotonic() - start
+        rec = instrumentation.recorder
+        if rec is not None:
+            rec.download(url, name, size - resumed_from, elapsed, status)
+        return DownloadResult(url, path, size, digest, status, resumed_from, elapsed)
+
+    def _fetch(self, url, path):
+        part = f"{path}.part"
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                # 已有部分超出服务器文件大小,丢弃重下
+                os.remove(part)
+                return self._fetch(url, path)
+            if response.status_code not in (200, 206):
+                raise DownloadError(f"HTTP {response.status_code}")
+
+            if response.status_code == 200:
+                offset = 0
+            expected = _expected_size(response, offset)
+            _check_type(path, response.headers.get("Content-Type", ""))
+
+            sha = hashlib.sha256()
+            if offset:
+                # 续传时先把已有部分计入哈希
+                with open(part, "rb") as f:
+                    for block in iter(lambda: f.read(self.chunk_size), b""):
+                        sha.update(block)
+
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(self.chunk_size):
+                    f.write(chunk)
+                    sha.update(chunk)
+
+        size = os.path.getsize(part)
+        if expected is not None and size != expected:
+            raise DownloadError(f"大小不符: 期望 {expected} 字节,实际 {size} 字节")
+        os.replace(part, path)
+        return size, sha.hexdigest(), offset
+
+    def download_all(self, items):
+        """并发下载,items 为 (url, name) 或 url;重复 URL 只下载一次,逐个产出 DownloadResult"""
+        seen = {}
+        for item in items:
+            url, name = item if isinstance(item, tuple) else (item, None)
+            seen.setdefault(url, name)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self.download, url, name) for url, name in seen.items()]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def close(self):
+        self.session.close()
+
+
+def _expected_size(response, offset):
+    if response.status_code == 206:
+        content_range = response.headers.get("Content-Range", "")
+        total = content_range.rpartition("/")[2]
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get("Content-Length")
+    # 开启压缩时 Content-Length 是压缩后的大小,无法用来校验
+    if length and length.isdigit() and not response.headers.get("Content-Encoding"):
+        return offset + int(length)
+    return None
+
+
+def _check_type(path, content_type):
+    expected = EXPECTED_TYPES.get(os.path.splitext(path)[1].lower())
+    content_type = content_type.split(";")[0].strip().lower()
+    if not expected or not content_type or content_type.startswith(GENERIC_TYPES):
+        return
+    if not content_type.startswith(expected):
+        raise DownloadError(f"Content-Type 不符: {content_type}")
+
+
+def items_from_results(path):
+    """从 batch_runner 的结果 JSONL 中取出成功任务的资源,文件名为 <task_id>_<序号>"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("status") != "succeeded":
+                continue
+            for i, url in enumerate(record.get("asset_urls") or []):
+                yield url, f"{record.get('task_id') or record['id']}_{i}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载已完成任务的生成结果")
+    parser.add_argument("results", help="batch_runner 输出的结果 JSONL")
+    parser.add_argument("-d", "--dest", default="scripts/downloads")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    downloader = AssetDownloader(args.dest, concurrency=args.concurrency)
+    counts = {}
+    total_bytes = 0
+    start = time.monotonic()
+    for result in downloader.download_all(items_from_results(args.results)):
+        counts[result.status] = counts.get(result.status, 0) + 1
+        if result.status == "failed":
+            print(f"❌ {result.url}: {result.error}")
+            continue
+        if result.status == "downloaded":
+            total_bytes += result.size - result.resumed_from
+        resumed = f" (从 {result.resumed_from} 字节续传)" if result.resumed_from else ""
+        print(f"✅ [{result.status}] {result.path} {result.size} 字节{resumed}")
+    downloader.close()
+
+    elapsed = time.monotonic() - start
+    print(f"\n完成: {counts},共下载 {total_bytes / 1024 / 1024:.1f} MB,耗时 {elapsed:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""批量生成任务执行器
+
+从 JSONL 或 CSV 读取任务(platform, action, prompt, model, size, duration …),
+在限流配额内并发提交,轮询到结束后以 JSONL 逐条输出结果。
+
+每次提交成功后立即写入检查点文件,进程中断后重新运行同一命令即可续跑:
+已完成的任务跳过,已提交未完成的任务只轮询、不会重新提交(避免重复扣费)。
+单个任务提交时的网络异常不会中断整批:确定没发出的请求记为 submit_failed,
+发出后读超时等无法确定是否已提交的留待下次续跑。
+
+加 --cache 时经过 result_cache 提交:与之前某次运行参数相同的任务直接复用成功结果,
+同一批中参数相同的任务只提交一次。
+
+用法:
+    python scripts/batch_runner.py jobs.jsonl -o results.jsonl
+    python scripts/batch_runner.py jobs.csv -o results.jsonl --checkpoint jobs.ckpt.jsonl
+    python scripts/batch_runner.py jobs.jsonl -o results.jsonl --cache
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api_client import PLATFORMS, _never_sent, get_client
+from rate_limiter import DailyQuotaExceeded
+from response_normalizer import normalize_task
+from result_cache import CachedSubmitter, ResultCache, SubmitError
+from task_ledger import DEFAULT_DB, TaskLedger
+from task_poller import INTERVALS, poll_task
+
+PAYLOAD_FIELDS = ("action", "prompt", "model", "size", "count", "duration",
+                  "aspect_ratio", "image_url", "lyrics", "style")
+INT_FIELDS = {"count", "duration"}
+VIDEO_ACTIONS = {"text2video", "image2video", "extend"}
+
+
+def load_jobs(path):
+    """读取任务文件,为每个任务生成稳定的 job_id(未显式给出 id 时按内容哈希)"""
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = [{k: v for k, v in row.items() if v not in (None, "")} for row in csv.DictReader(f)]
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    jobs = []
+    seen = {}
+    for row in rows:
+        for field in INT_FIELDS & row.keys():
+            row[field] = int(row[field])
+        job_id = row.get("id")
+        if not job_id:
+            digest = hashlib.sha1(json.dumps(row, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+            # 内容完全相同的任务按出现次序区分
+            seen[digest] = seen.get(digest, 0) + 1
+            job_id = digest if seen[digest] == 1 else f"{digest}-{seen[digest]}"
+        jobs.append({**row, "id": str(job_id)})
+    return jobs
+
+
+def resolve_kind(job):
+    """根据 kind / action / platform 推断接口类型 images、videos 或 music"""
+    if job.get("kind"):
+        kind = job["kind"]
+    elif job.get("action") in VIDEO_ACTIONS:
+        kind = "videos"
+    elif job.get("platform") in PLATFORMS["music"]:
+        kind = "music"
+    else:
+        kind = "images"
+    if kind not in PLATFORMS:
+        raise ValueError(f"未知的任务类型: {kind}")
+    if job.get("platform") not in PLATFORMS[kind]:
+        raise ValueError(f"平台 {job.get('platform')} 不支持 {kind},可选: {', '.join(PLATFORMS[kind])}")
+    return kind
+
+
+def build_payload(job, kind):
+    payload = {k: job[k] for k in PAYLOAD_FIELDS if k in job}
+    if kind == "images":
+        payload.setdefault("action", "generate")
+    elif kind == "videos":
+        payload.setdefault("action", "text2video")
+    if not payload.get("prompt"):
+        raise ValueError("缺少 prompt")
+    return payload
+
+
+class Checkpoint:
+    """追加写入的检查点日志,每行一个事件: submitted / done"""
+
+    def __init__(self, path):
+        self.path = path
+        self.submitted = {}
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if event["event"] == "submitted":
+                        self.submitted[event["id"]] = event
+                    elif event["event"] == "done":
+                        self.done.add(event["id"])
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, event):
+        # 提交成功意味着已经扣费,必须在继续之前落盘
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if event["event"] == "submitted":
+            self.submitted[event["id"]] = event
+        elif event["event"] == "done":
+            self.done.add(event["id"])
+
+    def close(self):
+        self._file.close()
+
+
+async def run_job(job, client, checkpoint, submit_semaphore, poll_semaphore, max_wait, ledger=None,
+                  submitter=None):
+    """提交(或续跑)单个任务并轮询到结束,返回结果记录;需要下次续跑时返回 None"""
+    record = {"id": job["id"], "platform": job.get("platform")}
+    try:
+        kind = resolve_kind(job)
+        payload = build_payload(job, kind)
+    except ValueError as e:
+        return {**record, "status": "invalid", "error": str(e)}
+    record["kind"] = kind
+
+    submitted = checkpoint.submitted.get(job["id"])
+    if submitted is None and submitter is not None:
+        return await run_cached_job(job, kind, payload, record, submitter, submit_semaphore, poll_semaphore,
+                                    checkpoint, ledger)
+    if submitted is None:
+        async with submit_semaphore:
+            try:
+                response = await asyncio.to_thread(client.create_task, job["platform"], kind, payload)
+            except DailyQuotaExceeded as e:
+                print(f"⏸️ {job['id']}: {e},留待下次续跑")
+                return None
+            except requests.RequestException as e:
+                return _submit_error(job, record, e)
+        if response.status_code == 429:
+            print(f"⏸️ {job['id']}: 提交被限流,留待下次续跑")
+            return None
+        body = _json_or_text(response)
+        task_id = body.get("task_id") if response.status_code == 200 else None
+        if not task_id:
+            return {**record, "status": "submit_failed", "http_status": response.status_code, "result": body}
+        submitted = {"event": "submitted", "id": job["id"], "platform": job["platform"],
+                     "kind": kind, "task_id": task_id}
+        checkpoint.record(submitted)
+        if ledger is not None:
+            ledger.record_submission(task_id, job["platform"], kind, payload, job["id"], body.get("trace_id"))
+        print(f"🚀 {job['id']}: 已提交 {job['platform']}/{kind} task_id={task_id}")
+
+    try:
+        poll = await poll_task(client, submitted["platform"], submitted["task_id"],
+                               poll_semaphore, INTERVALS, max_wait=max_wait)
+    except DailyQuotaExceeded as e:
+        print(f"⏸️ {job['id']}: {e},留待下次续跑")
+        return None
+    if ledger is not None:
+        ledger.record_poll_result(poll)
+    if poll.local_timeout:
+        # 只是本地等待超时,任务已扣费且可能仍在处理,不能记为 done,下次续跑继续轮询
+        print(f"⏸️ {job['id']}: 等待超时,留待下次续跑")
+        return None
+    normalized = normalize_task(poll.result, poll.platform)
+    return {**record, "task_id": poll.task_id, "status": poll.status, "polls": poll.polls,
+            "elapsed": round(poll.elapsed, 2), "trace_id": normalized.trace_id,
+            "asset_urls": list(normalized.asset_urls), "error": normalized.error_message,
+            "result": poll.result}
+
+
+async def run_cached_job(job, kind, payload, record, submitter, submit_semaphore, poll_semaphore, checkpoint,
+                         ledger=None):
+    """经过结果缓存提交;新提交的任务与不走缓存时一样立即写检查点和台账,续跑时只轮询不重新提交"""
+
+    def on_submit(pending):
+        checkpoint.record({"event": "submitted", "id": job["id"], "platform": job["platform"],
+                           "kind": kind, "task_id": pending["task_id"]})
+        if ledger is not None:
+            ledger.record_submission(pending["task_id"], job["platform"], kind, payload, job["id"],
+                                     pending.get("trace_id"))
+        print(f"🚀 {job['id']}: 已提交 {job['platform']}/{kind} task_id={pending['task_id']}")
+
+    try:
+        entry = await submitter.submit_async(job["platform"], kind, payload, submit_semaphore, poll_semaphore,
+                                             on_submit)
+    except DailyQuotaExceeded as e:
+        print(f"⏸️ {job['id']}: {e},留待下次续跑")
+        return None
+    except requests.RequestException as e:
+        return _submit_error(job, record, e)
+    except SubmitError as e:
+        if e.status_code == 429:
+            print(f"⏸️ {job['id']}: 提交被限流,留待下次续跑")
+            return None
+        return {**record, "status": "submit_failed", "http_status": e.status_code, "result": e.body}
+
+    if entry.get("local_timeout"):
+        print(f"⏸️ {job['id']}: 等待超时,留待下次续跑")
+        return None
+    if ledger is not None and entry["source"] in ("submitted", "resumed"):
+        if entry["source"] == "resumed":
+            ledger.record_submission(entry["task_id"], job["platform"], kind, payload, job["id"],
+                                     entry.get("trace_id"))
+        ledger.record_poll(entry["task_id"], entry["status"], entry["result"], entry.get("asset_urls"),
+                           entry.get("trace_id"), polls=entry.get("polls", 1))
+    print(f"{'♻️' if entry['source'] in ('cache', 'coalesced') else '🚀'} {job['id']}: "
+          f"{entry['source']} task_id={entry['task_id']}")
+    return {**record, "task_id": entry["task_id"], "status": entry["status"], "source": entry["source"],
+            "polls": entry.get("polls", 0), "elapsed": round(entry.get("elapsed", 0.0), 2),
+            "trace_id": entry.get("trace_id"), "asset_urls": entry.get("asset_urls") or [],
+            "error": entry.get("error"), "result": entry["result"]}
+
+
+def _submit_error(job, record, error):
+    """提交请求抛出的网络异常:确定没发出的记为 submit_failed;可能已被服务端受理的返回 None,下次续跑时重试"""
+    if _never_sent(error):
+        return {**record, "status": "submit_failed", "error": f"{type(error).__name__}: {error}"}
+    print(f"⏸️ {job['id']}: 提交时 {type(error).__name__},无法确定是否已提交,留待下次续跑")
+    return None
+
+
+def _json_or_text(response):
+    try:
+        return response.json()
+    except ValueError:
+        return {"error": response.text}
+
+
+async def run_batch(jobs, output_path, checkpoint_path, client=None,
+                    concurrency=5, poll_concurrency=10, max_wait=900, ledger=None, cache=None):
+    """执行一批任务,结果按完成顺序追加到 output_path,返回本次写出的结果数
+
+    cache: 传入 ResultCache 时经过结果缓存提交
+    """
+    client = client or get_client()
+    # 提交和查询都在线程里执行,默认线程池只有 min(32, CPU 数 + 4) 个线程,会压低实际并发
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency + poll_concurrency))
+    submitter = CachedSubmitter(client, cache, max_wait) if cache is not None else None
+    checkpoint = Checkpoint(checkpoint_path)
+    pending = [job for job in jobs if job["id"] not in checkpoint.done]
+    skipped = len(jobs) - len(pending)
+    resumed = sum(1 for job in pending if job["id"] in checkpoint.submitted)
+    print(f"共 {len(jobs)} 个任务: 已完成 {skipped},续轮询 {resumed},新提交 {len(pending) - resumed}")
+
+    submit_semaphore = asyncio.Semaphore(concurrency)
+    poll_semaphore = asyncio.Semaphore(poll_concurrency)
+    written = 0
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            coros = [run_job(job, client, checkpoint, submit_semaphore, poll_semaphore, max_wait, ledger,
+                             submitter) for job in pending]
+            for future in asyncio.as_completed(coros):
+                result = await future
+                if result is None:
+                    continue
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                checkpoint.record({"event": "done", "id": result["id"], "status": result["status"]})
+                written += 1
+                mark = "✅" if result["status"] == "succeeded" else "❌"
+                print(f"{mark} {result['id']}: {result['status']}")
+    finally:
+        checkpoint.close()
+    if submitter is not None:
+        stats = submitter.stats()
+        print(f"结果缓存: 命中 {stats['hits']},合并 {stats['coalesced']},续轮询 {stats['resumed']},"
+              f"未命中 {stats['misses']}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量提交生成任务并等待结果")
+    parser.add_argument("jobs", help="任务文件 (.jsonl 或 .csv)")
+    parser.add_argument("-o", "--output", default="scripts/batch_results.jsonl")
+    parser.add_argument("--checkpoint", help="检查点文件,默认为 <jobs>.checkpoint.jsonl")
+    parser.add_argument("--concurrency", type=int, default=5, help="同时提交的任务数")
+    parser.add_argument("--poll-concurrency", type=int, default=10, help="同时在途的查询数")
+    parser.add_argument("--max-wait", type=float, default=900, help="单个任务最长等待秒数")
+    parser.add_argument("--ledger", default=DEFAULT_DB, help="任务台账 SQLite 文件")
+    parser.add_argument("--no-ledger", action="store_true", help="不写入任务台账")
+    parser.add_argument("--cache", action="store_true", help="复用参数相同的成功结果,合并相同的提交")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.jobs)
+    checkpoint = args.checkpoint or f"{os.path.splitext(args.jobs)[0]}.checkpoint.jsonl"
+    ledger = None if args.no_ledger else TaskLedger(args.ledger)
+    try:
+        written = asyncio.run(run_batch(jobs, args.output, checkpoint,
+                                        concurrency=args.concurrency,
+                                        poll_concurrency=args.poll_concurrency,
+                                        max_wait=args.max_wait, ledger=ledger,
+                                        cache=ResultCache() if args.cache else None))
+    finally:
+        if ledger is not None:
+            ledger.close()
+    print(f"\n本次写出 {written} 条结果到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""连接复用检查(基于本地模拟服务)
+
+同样发 N 个请求,对比每次 requests.post 新建连接与 ApiClient 共享 Session 的
+建连数和耗时。ApiClient 串行时应只建 1 个连接,并发时不超过连接池大小,
+否则以退出码 1 结束。
+
+用法:
+    python scripts/bench_connection_reuse.py --requests 200 --concurrency 8
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api_client import ApiClient
+from mock_relay_server import MOCK_API_KEY, MockRelayServer
+
+
+def run(server, send, count, concurrency):
+    """发 count 个请求,返回 (建连数, 耗时)"""
+    server.state.connections = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for status in executor.map(lambda _: send(), range(count)):
+            assert status == 200, status
+    return server.state.connections, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ApiClient 连接复用检查")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with MockRelayServer() as server:
+        url = f"{server.base_url}/api/account/balance"
+
+        def fresh():
+            return requests.post(url, timeout=10).status_code
+
+        with ApiClient(api_key=MOCK_API_KEY, base_url=server.base_url, pool_size=args.concurrency) as client:
+            def pooled():
+                return client.balance().status_code
+
+            results = {
+                "每次新建连接": run(server, fresh, args.requests, 1),
+                "ApiClient 串行": run(server, pooled, args.requests, 1),
+                f"ApiClient 并发 {args.concurrency}": run(server, pooled, args.requests, args.concurrency),
+            }
+
+    print(f"请求数: {args.requests}")
+    for name, (connections, elapsed) in results.items():
+        print(f"{name:<20} 建连 {connections:>5}  耗时 {elapsed:6.2f}s  {elapsed / args.requests * 1000:6.2f} ms/请求")
+
+    serial = results["ApiClient 串行"][0]
+    concurrent = results[f"ApiClient 并发 {args.concurrency}"][0]
+    ok = serial == 1 and concurrent <= args.concurrency
+    print("✅ ApiClient 复用了连接" if ok else "❌ ApiClient 建连数超过预期")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
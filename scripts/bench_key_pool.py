@@ -0,0 +1,147 @@
+"""多 key 池的吞吐扩展和失败转移模拟(基于本地模拟服务)
+
+模拟服务按 key 分别限速,每个 key 每分钟 --per-minute 次。依次用 1、2、4、8 个 key
+在固定时长内持续提交,统计提交吞吐和相对单 key 的扩展效率,并用 KeyPool 查询全部任务,
+确认每个任务都由创建它的 key 查到。
+
+之后模拟失败转移:一个无效 key(401)、一个中途余额耗尽的 key(402)、
+一个同时被另一个进程占用配额的 key(429),确认提交全部落在其余 key 上。
+
+扩展效率低于 --min-efficiency 或出现查询失败时以退出码 1 结束。
+
+用法:
+    python scripts/bench_key_pool.py --keys 1,2,4,8 --duration 5 --per-minute 600
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import ApiClient
+from key_pool import KeyPool
+from mock_relay_server import MockRelayServer
+
+PAYLOAD = {"action": "generate", "prompt": "benchmark", "count": 1}
+
+
+def bench_key(i):
+    return f"sk-bench-{'x' * 24}-{i:04d}"
+
+
+def drive(pool, duration, workers):
+    """workers 个线程在 duration 秒内持续提交,返回 (成功的 task_id 列表, 其他状态码计数, 实际耗时)"""
+    deadline = time.perf_counter() + duration
+    lock = threading.Lock()
+    task_ids, statuses = [], {}
+
+    def worker():
+        while time.perf_counter() < deadline:
+            response = pool.create_task("grok", "images", PAYLOAD)
+            with lock:
+                if response.status_code == 200:
+                    task_ids.append(response.json()["task_id"])
+                else:
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in range(workers):
+            executor.submit(worker)
+    return task_ids, statuses, time.perf_counter() - start
+
+
+def check_pinning(pool, task_ids):
+    """用池查询每个任务,返回查询失败(非 200)的数量"""
+    return sum(1 for task_id in task_ids if pool.query_task("grok", task_id).status_code != 200)
+
+
+def scaling(args):
+    print("=" * 72)
+    print(f"吞吐扩展: 每个 key {args.per_minute}/分钟, 持续 {args.duration}s")
+    print("=" * 72)
+    print(f"{'key 数':>6}{'提交数':>8}{'吞吐/s':>10}{'理论上限/s':>12}{'扩展效率':>10}{'查询失败':>10}  各 key 提交数")
+    base = None
+    ok = True
+    for n in args.keys:
+        keys = [bench_key(i) for i in range(n)]
+        accounts = {k: {"per_minute": args.per_minute, "per_day": 1_000_000} for k in keys}
+        with MockRelayServer(task_duration=0.1, accounts=accounts) as server:
+            with KeyPool(keys, base_url=server.base_url, pool_size=args.workers_per_key * 2) as pool:
+                task_ids, statuses, elapsed = drive(pool, args.duration, n * args.workers_per_key)
+                failed = check_pinning(pool, task_ids)
+                per_key = [s["submitted"] for s in pool.stats()]
+        throughput = len(task_ids) / elapsed
+        base = base or throughput
+        efficiency = throughput / (base * n)
+        limit = n * args.per_minute / 60
+        ok = ok and efficiency >= args.min_efficiency and failed == 0 and not statuses
+        print(f"{n:>6}{len(task_ids):>8}{throughput:>10.1f}{limit:>12.1f}{efficiency:>10.0%}{failed:>10}  "
+              f"{per_key}{'  其他状态: ' + str(statuses) if statuses else ''}")
+    return ok
+
+
+def failover(args):
+    good = [bench_key(i) for i in range(3)]
+    invalid, broke = bench_key(900), bench_key(901)
+    shared = good[0]
+    submit_cost = 10
+    accounts = {k: {"per_minute": args.per_minute, "per_day": 1_000_000} for k in good}
+    accounts[broke] = {"per_minute": args.per_minute, "per_day": 1_000_000, "balance_cents": 5 * submit_cost}
+
+    print("\n" + "=" * 72)
+    print("失败转移: 无效 key + 余额只够 5 次的 key + 被其他进程占用配额的 key")
+    print("=" * 72)
+    with MockRelayServer(task_duration=0.1, accounts=accounts, submit_cost=submit_cost) as server:
+        # 另一个进程用同一个 key 按配额上限发请求,池按余额接口算出的配额提交就会收到 429
+        stop = threading.Event()
+
+        def competitor():
+            with ApiClient(api_key=shared, base_url=server.base_url, max_retries=0) as other:
+                while not stop.is_set():
+                    other.request("task", "/api/grok/tasks", json={"task_id": "competitor"}).close()
+                    time.sleep(60 / args.per_minute)
+
+        thread = threading.Thread(target=competitor, daemon=True)
+        thread.start()
+        keys = good + [invalid, broke]
+        with KeyPool(keys, base_url=server.base_url, pool_size=args.workers_per_key * 2) as pool:
+            task_ids, statuses, elapsed = drive(pool, args.duration, len(keys) * args.workers_per_key)
+            stop.set()
+            thread.join()
+            failed = check_pinning(pool, task_ids)
+            # 新的池没有 task_id 与 key 的对应关系(相当于从检查点续跑),查询时逐个 key 探测
+            with KeyPool(keys, base_url=server.base_url) as fresh:
+                probed_failed = check_pinning(fresh, task_ids[:20])
+            stats = pool.stats()
+        created = {k: a["submitted"] for k, a in server.state.accounts.items()}
+
+    for s, key in zip(stats, keys):
+        print(f"{s['key']:<14}{s['disabled'] or '可用':<12}提交 {s['submitted']:>4} "
+              f"(服务端 {created.get(key, 0):>4})  转移 {s['failovers']}")
+    print(f"成功提交 {len(task_ids)},吞吐 {len(task_ids) / elapsed:.1f}/s,其他状态 {statuses or '无'}")
+    print(f"查询失败: 固定 key {failed},新池探测 {probed_failed}")
+    return (not statuses and failed == 0 and probed_failed == 0
+            and stats[3]["disabled"] == "invalid" and stats[4]["disabled"] == "no_balance"
+            and stats[4]["submitted"] == 5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多 key 池吞吐扩展和失败转移模拟")
+    parser.add_argument("--keys", default="1,2,4,8", help="依次测试的 key 数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每组持续提交的秒数")
+    parser.add_argument("--per-minute", type=int, default=600, help="模拟服务每个 key 的每分钟配额")
+    parser.add_argument("--workers-per-key", type=int, default=2, help="每个 key 对应的提交线程数")
+    parser.add_argument("--min-efficiency", type=float, default=0.8, help="扩展效率下限")
+    args = parser.parse_args()
+    args.keys = [int(n) for n in args.keys.split(",")]
+
+    ok = scaling(args)
+    ok = failover(args) and ok
+    print("\n" + ("✅ 吞吐随 key 数线性增长,失败转移和查询固定均正常" if ok else "❌ 未达到预期,见上方明细"))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""响应归一化微基准
+
+以 scripts/ 下记录的真实响应和文档中的各种格式为样本,复制成数千条,
+对比逐层 .get() 探测的写法与 response_normalizer 按格式取值的开销。
+两者耗时相近;归一化额外产出完整的 NormalizedResult(task_id、错误码、trace_id 等)。
+
+用法:
+    python scripts/bench_normalizer.py --count 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from response_normalizer import normalize, normalize_task
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_samples():
+    """(endpoint, platform, response) 样本:记录文件 + 文档示例"""
+    with open(os.path.join(SCRIPTS_DIR, "api_response.json"), encoding="utf-8") as f:
+        processing = json.load(f)
+    with open(os.path.join(SCRIPTS_DIR, "api_verification_results.json"), encoding="utf-8") as f:
+        verification = json.load(f)
+
+    succeeded = json.loads(json.dumps(processing))
+    succeeded["finished_at"] = succeeded["created_at"] + 300
+    succeeded["response"].update(success=True, data={"imageUrls": [
+        "https://cdn.example.com/a.jpg", "https://cdn.example.com/b.jpg"]})
+
+    return [
+        ("tasks", "grok", processing),
+        ("tasks", "grok", succeeded),
+        ("tasks", "kling", {"id": "t", "response": {"success": True, "data": {"videoUrl": "https://cdn.example.com/v.mp4"}}}),
+        ("tasks", "sora", {"task_id": "t", "status": "processing", "created_at": "2026-01-24T10:30:00+08:00"}),
+        ("tasks", "sora", {"task_id": "t", "status": "succeeded", "video": {"url": "https://cdn.example.com/v.mp4", "duration": 5}}),
+        ("tasks", "suno", {"task_id": "t", "status": "succeeded", "music": [{"url": "https://cdn.example.com/s.mp3"}]}),
+        ("tasks", "kling", {"task_id": "t", "status": "failed", "error": {"code": "GENERATION_FAILED", "message": "生成失败"}}),
+        ("create", "kling", verification["video_generation"]["response"]),
+        ("balance", None, verification["account_balance"]["response"]),
+        ("upload", None, verification["file_upload"]["response"]),
+    ]
+
+
+def probe_get(endpoint, result):
+    """原脚本的写法:每次都逐层 .get() 探测所有已知格式"""
+    if endpoint == "tasks":
+        response = result.get("response", {}) or {}
+        if response.get("success") is True:
+            status = "succeeded"
+        elif response.get("success") is False:
+            status = "failed"
+        elif result.get("status"):
+            status = result.get("status")
+        elif result.get("finished_at"):
+            status = "failed"
+        else:
+            status = "processing"
+        data = response.get("data", {}) or {}
+        urls = list(data.get("imageUrls", []) or [])
+        if data.get("videoUrl"):
+            urls.append(data.get("videoUrl"))
+        urls += data.get("videoUrls", []) or []
+        urls += [i.get("url") for i in result.get("images", []) or []]
+        if (result.get("video") or {}).get("url"):
+            urls.append(result.get("video", {}).get("url"))
+        urls += [i.get("url") for i in result.get("music", []) or []]
+        return status, urls
+    data = (result.get("data") or [{}])
+    first = data[0] if data else {}
+    return result.get("success"), first.get("url") or (first.get("usage_today") or {}).get("cost_cents")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应归一化微基准")
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+
+    samples = load_samples()
+    random.seed(0)
+    corpus = [random.choice(samples) for _ in range(args.count)]
+
+    start = time.perf_counter()
+    for endpoint, _, result in corpus:
+        probe_get(endpoint, result)
+    probe = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for endpoint, platform, result in corpus:
+        if endpoint == "tasks":
+            normalize_task(result, platform)
+        else:
+            normalize(endpoint, result, platform)
+    table = time.perf_counter() - start
+
+    print(f"样本格式: {len(samples)} 种, 响应数: {args.count}")
+    print(f".get() 探测: {probe * 1000:8.1f} ms  {probe / args.count * 1e6:6.2f} µs/条  (只取 status + URL)")
+    print(f"按格式归一化: {table * 1000:8.1f} ms  {table / args.count * 1e6:6.2f} µs/条  (完整 NormalizedResult)")
+
+
+if __name__ == "__main__":
+    main()
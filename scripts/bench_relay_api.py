@@ -0,0 +1,391 @@
+"""中转 API 压测和延迟基准
+
+按配置的并发数和目标 RPS 混合调用任务提交、任务查询、余额查询和文件上传,
+统计每个接口的 p50/p95/p99 延迟、错误率和吞吐;提交成功的任务在后台线程里立即开始轮询,
+统计各平台从提交到完成的耗时(这些轮询请求不计入接口统计)。
+结果写成 JSON,可用 --compare 与上一次结果对比。
+
+默认启动本地模拟服务(mock_relay_server),完全离线运行;指定 --base-url 时压测真实服务,
+注意真实服务有每分钟请求数限制,且提交任务会扣费。
+
+指定 --rps 时请求按固定节奏发出,延迟从计划发出时刻算起(包含客户端排队时间),
+避免服务变慢时压测端跟着少发请求而低估尾延迟。
+
+用法:
+    python scripts/bench_relay_api.py --duration 20 --concurrency 16 --rps 200
+    python scripts/bench_relay_api.py --compare scripts/bench_results/relay_api-20260101-120000.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+from api_client import PLATFORMS, ApiClient
+from file_uploader import MultipartFileStream
+from mock_relay_server import MOCK_API_KEY, MockRelayServer
+from task_poller import poll_task
+
+ENDPOINTS = ("submit", "task", "balance", "upload")
+DEFAULT_MIX = "submit=2,task=6,balance=1,upload=1"
+DEFAULT_PLATFORMS = "images:grok,images:dreamina,videos:kling,videos:sora,music:suno"
+# 模拟服务上各平台的任务耗时(秒),让完成耗时的统计有区分度
+MOCK_DURATIONS = {"grok": 1.0, "dreamina": 1.5, "kling": 3.0, "sora": 4.0, "suno": 2.0}
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+
+PAYLOADS = {
+    "images": {"action": "generate", "prompt": "benchmark: a red apple", "count": 1},
+    "videos": {"action": "text2video", "prompt": "benchmark: waves on a beach", "duration": 5},
+    "music": {"action": "generate", "prompt": "benchmark: calm piano"},
+}
+
+# 这些指标变大算退化,其余(吞吐)变小算退化
+LOWER_IS_BETTER = {"p50_ms", "p95_ms", "p99_ms", "error_rate"}
+
+
+def percentile(sorted_values, q):
+    """线性插值的分位数,sorted_values 需已排序"""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else None,
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"未知接口 {name},可选: {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def parse_platforms(text):
+    targets = []
+    for part in text.split(","):
+        kind, _, platform = part.strip().partition(":")
+        if platform not in PLATFORMS.get(kind, ()):
+            raise ValueError(f"{kind} 不支持平台 {platform}")
+        targets.append((kind, platform))
+    return targets
+
+
+class LoadTest:
+    """按权重混合调用各接口,记录每次请求的延迟和状态码"""
+
+    def __init__(self, client, mix, targets, upload_path, seed_tasks=(), tracker=None):
+        self.client = client
+        self.tracker = tracker
+        self.targets = itertools.cycle(targets)
+        self.upload_path = upload_path
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.samples = {name: [] for name in self.names}
+        self.statuses = {name: {} for name in self.names}
+        self.known_tasks = list(seed_tasks)
+        self.lock = threading.Lock()
+        self.rng = random.Random(0)
+
+    def _call(self, name):
+        """执行一次请求,返回 (状态码或异常名, 新任务)"""
+        if name == "submit":
+            with self.lock:
+                kind, platform = next(self.targets)
+            response = self.client.create_task(platform, kind, PAYLOADS[kind])
+            task_id = response.json().get("task_id") if response.status_code == 200 else None
+            return response.status_code, (platform, task_id) if task_id else None
+        if name == "task":
+            with self.lock:
+                platform, task_id = self.rng.choice(self.known_tasks)
+            return self.client.query_task(platform, task_id).status_code, None
+        if name == "balance":
+            return self.client.balance().status_code, None
+        body = MultipartFileStream(self.upload_path)
+        try:
+            response = self.client.request("upload", "/api/upload/file", data=body,
+                                           headers={"Content-Type": body.content_type})
+        finally:
+            body.close()
+        return response.status_code, None
+
+    def run_one(self, name, scheduled):
+        try:
+            status, task = self._call(name)
+        except requests.RequestException as e:
+            status, task = type(e).__name__, None
+        done = time.perf_counter()
+        with self.lock:
+            self.samples[name].append((done - scheduled, status == 200))
+            self.statuses[name][str(status)] = self.statuses[name].get(str(status), 0) + 1
+            if task:
+                self.known_tasks.append(task)
+        if task and self.tracker is not None:
+            self.tracker.track(*task)
+
+    def run(self, duration, concurrency, rps=None, max_requests=None):
+        """运行 duration 秒(或 max_requests 个请求),返回实际耗时"""
+        stop_at = time.perf_counter() + duration
+        counter = itertools.count()
+        schedule_rng = random.Random(1)
+
+        def worker():
+            while True:
+                with self.lock:
+                    index = next(counter)
+                    name = schedule_rng.choices(self.names, self.weights)[0]
+                if max_requests is not None and index >= max_requests:
+                    return
+                if rps:
+                    scheduled = start + index / rps
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    scheduled = time.perf_counter()
+                if scheduled >= stop_at:
+                    return
+                self.run_one(name, scheduled)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for _ in range(concurrency):
+                executor.submit(worker)
+        return time.perf_counter() - start
+
+    def endpoint_report(self, wall_time):
+        report = {}
+        for name in self.names:
+            samples = self.samples[name]
+            ok = [latency * 1000 for latency, success in samples if success]
+            stats = summarize(ok)
+            report[name] = {
+                "requests": len(samples),
+                "ok": len(ok),
+                "errors": len(samples) - len(ok),
+                "error_rate": (len(samples) - len(ok)) / len(samples) if samples else 0.0,
+                "throughput_rps": len(ok) / wall_time if wall_time else 0.0,
+                **{f"{key}_ms": value for key, value in stats.items()},
+                "status_codes": self.statuses[name],
+            }
+        return report
+
+
+class CompletionTracker:
+    """在后台事件循环中轮询提交的任务,记录各平台从提交到完成的耗时"""
+
+    def __init__(self, client, concurrency=16, interval=0.25, max_wait=120, limit=200):
+        self.client = client
+        self.intervals = {s: (interval, interval * 2) for s in ("pending", "queued", "processing")}
+        self.max_wait = max_wait
+        self.limit = limit
+        self.results = []  # (platform, status, 耗时秒, 查询次数)
+        self.futures = []
+        self.lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def track(self, platform, task_id):
+        with self.lock:
+            if len(self.futures) >= self.limit:
+                return
+            self.futures.append(asyncio.run_coroutine_threadsafe(
+                self._poll(platform, task_id, time.monotonic()), self.loop))
+
+    async def _poll(self, platform, task_id, submitted_at):
+        result = await poll_task(self.client, platform, task_id, self.semaphore, self.intervals,
+                                 growth=1.0, max_wait=self.max_wait)
+        # 精度受轮询间隔限制
+        self.results.append((platform, result.status, time.monotonic() - submitted_at, result.polls))
+
+    def report(self):
+        """等待所有任务结束,返回按平台汇总的完成耗时"""
+        wait(self.futures)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+        by_platform = {}
+        for platform, status, elapsed, polls in self.results:
+            entry = by_platform.setdefault(platform, {"tasks": 0, "succeeded": 0, "times": [], "polls": 0})
+            entry["tasks"] += 1
+            entry["polls"] += polls
+            if status == "succeeded":
+                entry["succeeded"] += 1
+                entry["times"].append(elapsed)
+
+        report = {}
+        for platform, entry in sorted(by_platform.items()):
+            stats = summarize(entry.pop("times"))
+            report[platform] = {**entry, **{f"{key}_s": value for key, value in stats.items()}}
+        return report
+
+
+def compare(current, baseline_path, threshold):
+    """与基线结果逐项对比,返回退化项列表"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\n与基线对比: {baseline_path}(阈值 {threshold:.0%})")
+    for name, stats in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "error_rate"):
+            old, new = base.get(key), stats.get(key)
+            if old is None or new is None:
+                continue
+            if key == "error_rate":
+                change = new - old
+                worse = change > threshold / 10
+                text = f"{old:.2%} -> {new:.2%}"
+            else:
+                change = (new - old) / old if old else 0.0
+                worse = change > threshold if key in LOWER_IS_BETTER else change < -threshold
+                text = f"{old:.2f} -> {new:.2f} ({change:+.1%})"
+            mark = "⚠️" if worse else "  "
+            print(f"{mark} {name:<8} {key:<15} {text}")
+            if worse:
+                regressions.append(f"{name}.{key}")
+    return regressions
+
+
+def print_report(report):
+    print("=" * 90)
+    meta = report["meta"]
+    print(f"目标: {meta['base_url']}  时长: {meta['wall_time_s']:.1f}s  并发: {meta['concurrency']}"
+          f"  目标 RPS: {meta['rps'] or '不限'}  实际: {meta['total_rps']:.1f} 请求/秒")
+    print("=" * 90)
+    print(f"{'接口':<8} {'请求':>7} {'错误率':>8} {'吞吐/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, s in report["endpoints"].items():
+        cells = [f"{s[key]:9.2f}" if s[key] is not None else f"{'-':>9}"
+                 for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{name:<8} {s['requests']:>7} {s['error_rate']:>8.2%} {s['throughput_rps']:>9.1f} {' '.join(cells)}")
+    if report["completion"]:
+        print(f"\n{'平台':<10} {'任务':>6} {'成功':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}")
+        for platform, s in report["completion"].items():
+            cells = [f"{s[key]:8.2f}" if s[key] is not None else f"{'-':>8}" for key in ("p50_s", "p95_s", "p99_s")]
+            print(f"{platform:<10} {s['tasks']:>6} {s['succeeded']:>6} {' '.join(cells)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中转 API 压测和延迟基准")
+    parser.add_argument("--base-url", help="压测的服务地址,默认启动本地模拟服务")
+    parser.add_argument("--duration", type=float, default=10.0, help="压测时长(秒)")
+    parser.add_argument("--requests", type=int, help="请求总数上限")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rps", type=float, help="目标请求速率,默认不限速")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="接口权重,如 submit=2,task=6,balance=1,upload=1")
+    parser.add_argument("--platforms", default=DEFAULT_PLATFORMS, help="提交的 类型:平台 列表")
+    parser.add_argument("--upload-size", type=int, default=256, help="上传文件大小(KB)")
+    parser.add_argument("--track-tasks", type=int, default=200, help="统计完成耗时的任务数上限,0 表示不统计")
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--max-wait", type=float, default=120)
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务的单请求延迟(秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务随机返回 503 的比例")
+    parser.add_argument("--output", help="结果 JSON 路径,默认写入 scripts/bench_results/")
+    parser.add_argument("--compare", help="与之对比的基线结果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定退化的相对变化阈值")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    targets = parse_platforms(args.platforms)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = MockRelayServer(platform_durations=MOCK_DURATIONS, latency=args.latency,
+                                 error_rate=args.error_rate).start()
+        base_url = server.base_url
+
+    # 不重试:每次请求只测一次,错误如实计入错误率
+    # 压测真实服务时使用环境变量中的 key
+    client = ApiClient(api_key=MOCK_API_KEY if server else None, base_url=base_url,
+                       pool_size=args.concurrency * 2, max_retries=0)
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+        f.write(os.urandom(args.upload_size * 1024))
+        upload_path = f.name
+    try:
+        seed = []
+        if "task" in mix:
+            # 任务查询需要已有的任务,先提交几个(不计入统计)
+            for kind, platform in targets:
+                response = client.create_task(platform, kind, PAYLOADS[kind])
+                if response.status_code == 200:
+                    seed.append((platform, response.json()["task_id"]))
+            if not seed:
+                raise SystemExit("❌ 无法提交预热任务,检查服务地址和 API Key")
+
+        tracker = None
+        if args.track_tasks and "submit" in mix:
+            tracker = CompletionTracker(client, args.concurrency, args.poll_interval, args.max_wait,
+                                        args.track_tasks)
+        test = LoadTest(client, mix, targets, upload_path, seed, tracker)
+        wall_time = test.run(args.duration, args.concurrency, args.rps, args.requests)
+        total = sum(len(samples) for samples in test.samples.values())
+        completion = tracker.report() if tracker else {}
+
+        report = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "base_url": base_url,
+                "mock": server is not None,
+                "duration_s": args.duration,
+                "wall_time_s": wall_time,
+                "concurrency": args.concurrency,
+                "rps": args.rps,
+                "mix": mix,
+                "platforms": [f"{kind}:{platform}" for kind, platform in targets],
+                "upload_size_kb": args.upload_size,
+                "total_requests": total,
+                "total_rps": total / wall_time if wall_time else 0.0,
+            },
+            "endpoints": test.endpoint_report(wall_time),
+            "completion": completion,
+        }
+    finally:
+        os.unlink(upload_path)
+        client.close()
+        if server is not None:
+            server.stop()
+
+    print_report(report)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"relay_api-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已保存: {output}")
+
+    if args.compare and compare(report, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""任务台账写入和查询基准
+
+用法:
+    python scripts/bench_task_ledger.py --rows 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from api_client import PLATFORMS
+from task_ledger import TaskLedger
+
+STATUSES = ("pending", "queued", "processing", "succeeded", "succeeded", "succeeded", "failed", "timeout")
+
+
+def fake_rows(count, seed=0):
+    rng = random.Random(seed)
+    kinds = [(kind, platform) for kind, platforms in PLATFORMS.items() for platform in platforms]
+    now = time.time()
+    for _ in range(count):
+        kind, platform = rng.choice(kinds)
+        status = rng.choice(STATUSES)
+        created = now - rng.uniform(0, 30 * 86400)
+        yield {
+            "task_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "platform": platform,
+            "kind": kind,
+            "status": status,
+            "request": {"prompt": "benchmark prompt", "size": "1024x1024"},
+            "asset_urls": [f"https://cdn.example.com/{rng.getrandbits(64):x}.png"] if status == "succeeded" else None,
+            "cost_cents": rng.choice((10, 20, 50, 100)),
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+def timed(label, func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed * 1000 / repeat:10.3f} ms/次")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务台账基准")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    rows = list(fake_rows(args.rows))
+    with tempfile.TemporaryDirectory() as tmp:
+        with TaskLedger(os.path.join(tmp, "bench.db")) as ledger:
+            start = time.perf_counter()
+            ledger.bulk_insert(rows, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - start
+            print(f"批量写入 {args.rows} 行 (每批 {args.batch_size}): {elapsed:.2f}s, {args.rows / elapsed:,.0f} 行/秒")
+
+            sample = [row["task_id"] for row in random.Random(1).sample(rows, 1000)]
+            timed("按 task_id 查询 (1000 次)", lambda: [ledger.get(t) for t in sample])
+            found = timed("未结束的 kling 任务", lambda: ledger.unfinished("kling"), repeat=20)
+            print(f"{'':<36} -> {len(found)} 个")
+            timed("某平台某状态 (limit 100)", lambda: ledger.query("sora", "failed", limit=100), repeat=20)
+            timed("最近 1 天创建的任务", lambda: ledger.query(since=time.time() - 86400), repeat=20)
+            timed("按平台/状态计数", ledger.status_counts, repeat=20)
+
+            plan = ledger.conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM tasks WHERE platform = ? AND status NOT IN (?, ?)",
+                ("kling", "succeeded", "failed")).fetchall()
+            print("查询计划:", "; ".join(row[-1] for row in plan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""并发轮询 vs 原有串行 sleep 轮询的吞吐对比(基于本地模拟服务)
+
+用法:
+    python scripts/bench_task_poller.py --tasks 50 --task-duration 2
+"""
+
+import argparse
+import time
+
+from api_client import ApiClient
+from mock_relay_server import MOCK_API_KEY, MockRelayServer
+from task_poller import TERMINAL_STATUSES, poll_all, task_status
+
+
+def sequential_poll(client, tasks, interval):
+    """原 verify_grok_api_v2 的做法:逐个任务 sleep + 查询,直到结束"""
+    for platform, task_id in tasks:
+        while True:
+            time.sleep(interval)
+            result = client.query_task(platform, task_id).json()
+            if task_status(result) in TERMINAL_STATUSES:
+                break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务轮询吞吐基准")
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--task-duration", type=float, default=2.0, help="模拟任务完成耗时(秒)")
+    parser.add_argument("--interval", type=float, default=1.0, help="串行轮询间隔(秒),对应原来的 sleep(3)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    with MockRelayServer(task_duration=args.task_duration) as server:
+        client = ApiClient(api_key=MOCK_API_KEY, base_url=server.base_url, pool_size=args.concurrency)
+        payload = {"action": "generate", "prompt": "benchmark", "count": 1}
+
+        def submit():
+            return [("grok", client.create_task("grok", "images", payload).json()["task_id"])
+                    for _ in range(args.tasks)]
+
+        tasks = submit()
+        server.state.requests = 0
+        start = time.perf_counter()
+        sequential_poll(client, tasks, args.interval)
+        sequential = time.perf_counter() - start
+        sequential_requests = server.state.requests
+
+        tasks = submit()
+        server.state.requests = 0
+        # 与串行版本使用相同的初始间隔,保证对比公平
+        intervals = {s: (args.interval, args.interval * 4) for s in ("pending", "queued", "processing")}
+        start = time.perf_counter()
+        results = poll_all(tasks, client=client, concurrency=args.concurrency, intervals=intervals)
+        concurrent = time.perf_counter() - start
+        concurrent_requests = server.state.requests
+
+        client.close()
+
+    succeeded = sum(1 for r in results if r.status == "succeeded")
+    print("=" * 60)
+    print(f"任务数: {args.tasks}, 模拟耗时: {args.task_duration}s, 并发上限: {args.concurrency}")
+    print("=" * 60)
+    print(f"串行轮询: {sequential:8.2f}s  {args.tasks / sequential:8.2f} 任务/秒  查询 {sequential_requests} 次")
+    print(f"并发轮询: {concurrent:8.2f}s  {args.tasks / concurrent:8.2f} 任务/秒  查询 {concurrent_requests} 次")
+    print(f"成功: {succeeded}/{len(results)}, 加速比: {sequential / concurrent:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
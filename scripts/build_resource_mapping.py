@@ -0,0 +1,349 @@
+"""从 public/img_video 自动生成 resource_mapping.json 和查询索引
+
+按文件名推断素材之间的关系:
+- 图片 imgs/<效果>_<场景>_1.png 为原图,_2 为效果图,同一 <效果>_<场景> 组成一对
+- 视频 videos/<名称>.mp4 忽略大小写、空格、- 和 _ 后与图片的 <效果>_<场景> 匹配,
+  匹配不上时再按场景名匹配(场景名唯一时)
+- 新视频的分组:旧清单中同一效果的视频最常用的分组,没有时用匹配图片的效果名;
+  匹配不到图片的视频不写入清单,在报告中列为 unassigned
+
+同时做完整性检查:清单引用但磁盘上不存在的文件、缺少 _1 或 _2 的图片、
+无法识别的文件名,以及内容相同(sha256 一致)的重复文件;
+同一张原图被多个效果共用是正常的,单独列为 shared_originals。
+
+除了保持原结构的 resource_mapping.json,还输出 resource_index.json:
+entries 为全部条目,by_effect / by_scene / by_path 直接给出条目下标,查询只需一次字典访问。
+ResourceIndex 提供对应的读取接口。
+
+两个素材目录的修改时间都没变、输出文件也没被改过时直接跳过;
+有变化时重新扫描,只对大小或修改时间变了的文件重新计算哈希(线程池并行)。
+目录修改时间只反映增删和重命名,原地替换文件内容后需要加 --force。
+
+默认保留旧清单中引用了、但磁盘上已不存在的条目(在报告中列出),加 --prune 时删除。
+
+用法:
+    python scripts/build_resource_mapping.py
+    python scripts/build_resource_mapping.py --check      # 有缺失或重复文件时退出码为 1
+    python scripts/build_resource_mapping.py --prune --force
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from optimize_media import MAPPING_PATH, PUBLIC_DIR, ROOT, file_sha256, load_cache, save_json
+
+MEDIA_DIRS = {"photo": "/img_video/imgs", "video": "/img_video/videos"}
+EXTENSIONS = {
+    "photo": {".png", ".jpg", ".jpeg", ".webp", ".gif"},
+    "video": {".mp4", ".mov", ".webm"},
+}
+INDEX_PATH = os.path.join(ROOT, "resource_index.json")
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mapping_cache.json")
+# 修改生成逻辑时递增,使旧缓存失效
+VERSION = 2
+
+PHOTO_NAME = re.compile(r"^(.+)_([12])$")
+ROLES = {"1": "original", "2": "effect"}
+
+
+def match_key(name):
+    return re.sub(r"[\s_\-]", "", name).casefold()
+
+
+def scan_dir(kind):
+    """列出目录中的素材,返回 [(url, size, mtime_ns)]"""
+    base = MEDIA_DIRS[kind]
+    path = os.path.join(PUBLIC_DIR, base.lstrip("/"))
+    files = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            files.append((f"{base}/{entry.name}", stat.st_size, stat.st_mtime_ns))
+    return files
+
+
+def hash_files(files, cached, jobs):
+    """返回 {url: {size, mtime_ns, sha256}};大小和修改时间没变的文件沿用缓存里的哈希"""
+    result, todo = {}, []
+    for url, size, mtime_ns in files:
+        old = cached.get(url)
+        if old is not None and old["size"] == size and old["mtime_ns"] == mtime_ns:
+            result[url] = old
+        else:
+            todo.append((url, size, mtime_ns))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        paths = [os.path.join(PUBLIC_DIR, url.lstrip("/")) for url, _, _ in todo]
+        for (url, size, mtime_ns), digest in zip(todo, executor.map(file_sha256, paths)):
+            result[url] = {"size": size, "mtime_ns": mtime_ns, "sha256": digest}
+    return result, len(todo)
+
+
+def build_photos(urls):
+    """按 <效果>_<场景>_1/_2 配对图片,返回 ({效果: {base_name: 条目}}, 无法识别的文件)"""
+    groups, unrecognized = {}, []
+    for url in urls:
+        stem = os.path.splitext(url.rsplit("/", 1)[1])[0]
+        match = PHOTO_NAME.match(stem)
+        if match is None:
+            unrecognized.append(url)
+            continue
+        base_name, number = match.groups()
+        effect, _, scene = base_name.partition("_")
+        entry = groups.setdefault(effect, {}).setdefault(base_name, {
+            "base_name": base_name, "scene": scene or None, "original": None, "effect": None,
+        })
+        entry[ROLES[number]] = url
+    return groups, unrecognized
+
+
+def match_photo(base_name, photos_by_key, photos_by_scene):
+    photo = photos_by_key.get(match_key(base_name))
+    if photo is None:
+        candidates = photos_by_scene.get(match_key(base_name), [])
+        photo = candidates[0] if len(candidates) == 1 else None
+    return photo
+
+
+def build_mapping(photo_urls, video_urls, previous, prune=False):
+    """生成与手工维护时结构相同的 resource_mapping;previous 为旧清单,用于保留视频分组和缺失条目
+
+    返回 (mapping, 无法识别的图片, 无法确定分组的视频)
+    """
+    photo_groups, unrecognized = build_photos(photo_urls)
+    previous_videos = {}
+    for group, items in previous.get("video_effects", {}).items():
+        for item in items:
+            previous_videos[item["video"]] = (group, item)
+
+    if not prune:
+        for effect, items in previous.get("photo_effects", {}).items():
+            for item in items:
+                entry = photo_groups.setdefault(effect, {}).setdefault(item["base_name"], dict(item))
+                for role in ROLES.values():
+                    entry[role] = entry[role] or item.get(role)
+
+    photos_by_key, photos_by_scene = {}, {}
+    for items in photo_groups.values():
+        for entry in items.values():
+            photos_by_key[match_key(entry["base_name"])] = entry
+            if entry["scene"]:
+                photos_by_scene.setdefault(match_key(entry["scene"]), []).append(entry)
+
+    # 按匹配图片的效果统计旧清单里视频的分组,新视频沿用同一效果最常用的分组
+    effect_of = {entry["base_name"]: effect for effect, items in photo_groups.items() for entry in items.values()}
+    effect_groups = {}
+    for group, item in previous_videos.values():
+        photo = item.get("matched_photo")
+        effect = effect_of.get(photo["base_name"]) if photo else None
+        if effect:
+            effect_groups.setdefault(effect, Counter())[group] += 1
+
+    video_groups, unassigned = {}, []
+    videos = set(video_urls)
+    if not prune:
+        videos.update(previous_videos)
+    for url in sorted(videos):
+        base_name = os.path.splitext(url.rsplit("/", 1)[1])[0]
+        photo = match_photo(base_name, photos_by_key, photos_by_scene)
+        if url in previous_videos:
+            group = previous_videos[url][0]
+        elif photo is not None:
+            effect = effect_of[photo["base_name"]]
+            group = effect_groups[effect].most_common(1)[0][0] if effect in effect_groups else effect
+        else:
+            unassigned.append(url)
+            continue
+        video_groups.setdefault(group, []).append({"base_name": base_name, "video": url, "matched_photo": photo})
+
+    mapping = {
+        "photo_effects": {
+            effect: [items[name] for name in sorted(items)] for effect, items in sorted(photo_groups.items())
+        },
+        "video_effects": {
+            group: sorted(items, key=lambda v: v["base_name"]) for group, items in sorted(video_groups.items())
+        },
+    }
+    return mapping, unrecognized, unassigned
+
+
+def build_index(mapping, files):
+    """把清单展开成条目列表,并为效果、场景和文件路径建立到条目下标的索引"""
+    entries, by_effect, by_scene, by_path = [], {}, {}, {}
+    photo_ids, originals = {}, set()
+
+    def add(entry, paths):
+        entry_id = len(entries)
+        entries.append(entry)
+        by_effect.setdefault(entry["group"], []).append(entry_id)
+        if entry["scene"]:
+            by_scene.setdefault(entry["scene"], []).append(entry_id)
+        for path in paths:
+            if path:
+                by_path[path] = entry_id
+        return entry_id
+
+    for effect, items in mapping["photo_effects"].items():
+        for item in items:
+            photo_ids[item["base_name"]] = add({"type": "photo", "group": effect, **item},
+                                               (item["original"], item["effect"]))
+            originals.add(item["original"])
+    for group, items in mapping["video_effects"].items():
+        for item in items:
+            photo = item["matched_photo"]
+            add({"type": "video", "group": group, "base_name": item["base_name"],
+                 "scene": photo["scene"] if photo else item["base_name"].partition("_")[2] or None,
+                 "video": item["video"],
+                 "matched": photo_ids.get(photo["base_name"]) if photo else None},
+                (item["video"],))
+
+    referenced = set(by_path)
+    missing = sorted(path for path in referenced if path not in files)
+    incomplete = sorted(e["base_name"] for e in entries
+                        if e["type"] == "photo" and not (e["original"] and e["effect"]))
+    by_hash = {}
+    for path, info in files.items():
+        by_hash.setdefault(info["sha256"], []).append(path)
+    duplicates = sorted(sorted(paths) for paths in by_hash.values() if len(paths) > 1)
+    # 同一张原图用于多个效果是正常的,单独列出,不算重复
+    shared = [paths for paths in duplicates if originals.issuperset(paths)]
+    duplicates = [paths for paths in duplicates if not originals.issuperset(paths)]
+    unreferenced = sorted(path for path in files if path not in referenced)
+
+    return {
+        "version": VERSION,
+        "entries": entries,
+        "by_effect": by_effect,
+        "by_scene": by_scene,
+        "by_path": by_path,
+        "sha256": {path: files[path]["sha256"] for path in sorted(files)},
+        "issues": {"missing": missing, "incomplete": incomplete,
+                   "duplicates": duplicates, "shared_originals": shared, "unreferenced": unreferenced},
+    }
+
+
+class ResourceIndex:
+    """resource_index.json 的读取接口,各查询都是一次字典访问"""
+
+    def __init__(self, path=INDEX_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.entries = data["entries"]
+        self._by_effect = data["by_effect"]
+        self._by_scene = data["by_scene"]
+        self._by_path = data["by_path"]
+        self.issues = data["issues"]
+
+    def by_effect(self, effect):
+        return [self.entries[i] for i in self._by_effect.get(effect, ())]
+
+    def by_scene(self, scene):
+        return [self.entries[i] for i in self._by_scene.get(scene, ())]
+
+    def by_path(self, path):
+        entry_id = self._by_path.get(path)
+        return self.entries[entry_id] if entry_id is not None else None
+
+    def matched_photo(self, entry):
+        """视频条目对应的图片条目"""
+        return self.entries[entry["matched"]] if entry.get("matched") is not None else None
+
+
+def _mtime_ns(path):
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+
+def save_compact_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def report(index, rehashed, total, elapsed):
+    issues = index["issues"]
+    photos = sum(1 for e in index["entries"] if e["type"] == "photo")
+    print(f"图片条目 {photos},视频条目 {len(index['entries']) - photos},"
+          f"文件 {total}(重新计算哈希 {rehashed}),耗时 {elapsed:.2f}s")
+    for path in issues["missing"]:
+        print(f"⚠️ 文件不存在: {path}")
+    for base_name in issues["incomplete"]:
+        print(f"⚠️ 缺少 _1 或 _2: {base_name}")
+    for paths in issues["duplicates"]:
+        print(f"⚠️ 内容重复: {', '.join(paths)}")
+    if issues["shared_originals"]:
+        print(f"ℹ️ {len(issues['shared_originals'])} 组原图被多个效果共用"
+              f"(共 {sum(map(len, issues['shared_originals']))} 个文件),明细见索引的 issues.shared_originals")
+    for path in issues["unassigned"]:
+        print(f"⚠️ 匹配不到图片、无法确定分组的视频(未写入清单): {path}")
+    for path in issues["unreferenced"]:
+        print(f"ℹ️ 未被引用: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="扫描 public/img_video 生成素材清单和查询索引")
+    parser.add_argument("--mapping", default=MAPPING_PATH)
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--jobs", type=int, default=8, help="计算哈希的线程数")
+    parser.add_argument("--prune", action="store_true", help="删除引用了不存在文件的条目")
+    parser.add_argument("--force", action="store_true", help="忽略目录修改时间,全部重新扫描")
+    parser.add_argument("--check", action="store_true", help="有缺失或重复文件时以退出码 1 结束")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    cache = load_cache(CACHE_PATH)
+    dirs = {url: _mtime_ns(os.path.join(PUBLIC_DIR, url.lstrip("/"))) for url in MEDIA_DIRS.values()}
+    outputs = {path: _mtime_ns(path) for path in (args.mapping, args.index)}
+    unchanged = (not args.force and cache.get("version") == VERSION and cache.get("prune") == args.prune
+                 and cache.get("dirs") == dirs and cache.get("outputs") == outputs)
+
+    if unchanged:
+        index = {"issues": cache["issues"]}
+        print(f"素材目录未变化,跳过生成(耗时 {time.perf_counter() - started:.3f}s)")
+    else:
+        with ThreadPoolExecutor(max_workers=len(MEDIA_DIRS)) as executor:
+            scanned = dict(zip(MEDIA_DIRS, executor.map(scan_dir, MEDIA_DIRS)))
+        listed = {kind: [f for f in files if os.path.splitext(f[0])[1].lower() in EXTENSIONS[kind]]
+                  for kind, files in scanned.items()}
+        files, rehashed = hash_files([f for kind in listed for f in listed[kind]],
+                                     {} if args.force else cache.get("files", {}), args.jobs)
+
+        previous = {}
+        if os.path.exists(args.mapping):
+            with open(args.mapping, encoding="utf-8") as f:
+                previous = json.load(f)
+        mapping, unrecognized, unassigned = build_mapping([url for url, _, _ in sorted(listed["photo"])],
+                                              [url for url, _, _ in sorted(listed["video"])],
+                                              previous, args.prune)
+        index = build_index(mapping, files)
+        index["issues"]["unassigned"] = unassigned
+        index["issues"]["unreferenced"] = [p for p in index["issues"]["unreferenced"] if p not in unassigned]
+        index["issues"]["unrecognized"] = sorted(
+            unrecognized + [url for kind in scanned for url, _, _ in scanned[kind]
+                            if os.path.splitext(url)[1].lower() not in EXTENSIONS[kind]])
+
+        if mapping != previous:
+            save_json(args.mapping, mapping)
+        save_compact_json(args.index, index)
+        save_json(CACHE_PATH, {
+            "version": VERSION, "prune": args.prune, "dirs": dirs,
+            "outputs": {path: _mtime_ns(path) for path in (args.mapping, args.index)},
+            "files": files, "issues": index["issues"],
+        })
+        report(index, rehashed, len(files), time.perf_counter() - started)
+        for path in index["issues"]["unrecognized"]:
+            print(f"⚠️ 无法识别的文件名: {path}")
+
+    issues = index["issues"]
+    if args.check and (issues["missing"] or issues["incomplete"] or issues["duplicates"]):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
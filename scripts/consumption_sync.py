@@ -0,0 +1,224 @@
+"""消费记录增量同步和费用汇总
+
+从 /api/account/consumption 拉取消费记录,写入任务台账同一个 SQLite 文件:
+- 以上次同步到的日期为高水位,只拉取之后的记录(高水位当天会重新拉取,按记录 id 去重);
+  按平台过滤的同步只推进该平台自己的高水位,不影响全量同步
+- 同步区间按天切成窗口,多个窗口并发请求;单个窗口记录数超过一页时按 page 继续翻页
+- 记录按列存储(费用为整数分、日期单独一列),汇总由 SQLite 的 GROUP BY 完成,
+  不在 Python 里逐条累加
+- 同步后回填 tasks 表的 cost_cents
+
+用法:
+    python scripts/consumption_sync.py sync --since 2026-01-01
+    python scripts/consumption_sync.py report --by platform,day
+"""
+
+import argparse
+import datetime
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_client import get_client
+from response_normalizer import normalize
+from task_ledger import DEFAULT_DB
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS consumption (
+    id          TEXT PRIMARY KEY,
+    task_id     TEXT,
+    platform    TEXT NOT NULL,
+    task_type   TEXT,
+    cost_cents  INTEGER NOT NULL,
+    day         TEXT NOT NULL,
+    created     TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_consumption_day ON consumption (day);
+CREATE INDEX IF NOT EXISTS idx_consumption_platform_day ON consumption (platform, day);
+CREATE INDEX IF NOT EXISTS idx_consumption_task_id ON consumption (task_id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key     TEXT PRIMARY KEY,
+    value   TEXT NOT NULL
+);
+"""
+
+HWM_KEY = "consumption_hwm"
+ROLLUP_COLUMNS = {"platform", "day", "task_type"}
+DEFAULT_LOOKBACK_DAYS = 30
+
+
+class ConsumptionError(Exception):
+    """消费记录接口返回错误"""
+
+
+def date_windows(start, end, days=1):
+    """把 [start, end] 切成每段 days 天的 (start_date, end_date) 字符串窗口"""
+    current = datetime.date.fromisoformat(start)
+    last = datetime.date.fromisoformat(end)
+    step = datetime.timedelta(days=days)
+    windows = []
+    while current <= last:
+        window_end = min(current + step - datetime.timedelta(days=1), last)
+        windows.append((current.isoformat(), window_end.isoformat()))
+        current = window_end + datetime.timedelta(days=1)
+    return windows
+
+
+def fetch_window(client, start, end, platform=None, page_size=100):
+    """拉取一个日期窗口内的全部记录,必要时翻页"""
+    records = []
+    seen = set()
+    page = 1
+    while True:
+        response = client.consumption(start, end, platform, page=page, page_size=page_size)
+        if response.status_code != 200:
+            raise ConsumptionError(f"{start}~{end} 第 {page} 页: HTTP {response.status_code} {response.text[:200]}")
+        result = normalize("consumption", response.json(), platform)
+        if not result.ok:
+            raise ConsumptionError(f"{start}~{end}: {result.error_message}")
+        new = [r for r in result.details or () if r.get("id") not in seen]
+        records.extend(new)
+        seen.update(r.get("id") for r in new)
+
+        total = ((result.raw.get("data") or [{}])[0] or {}).get("total") or 0
+        if len(records) >= total or not result.details:
+            return records
+        if not new:
+            # 服务端忽略了分页参数,继续翻页也拿不到新记录
+            print(f"⚠️ {start}~{end}: 共 {total} 条,只拿到 {len(records)} 条,请缩小窗口")
+            return records
+        page += 1
+
+
+def open_db(path=DEFAULT_DB):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _hwm_key(platform):
+    return f"{HWM_KEY}:{platform}" if platform else HWM_KEY
+
+
+def _high_water_mark(conn, platform=None):
+    """全量同步的高水位;指定平台时取该平台与全量高水位中较晚的一个(全量同步也覆盖了该平台)"""
+    keys = (HWM_KEY, _hwm_key(platform)) if platform else (HWM_KEY,)
+    rows = conn.execute(f"SELECT value FROM sync_state WHERE key IN ({', '.join('?' for _ in keys)})",
+                        keys).fetchall()
+    return max((row["value"] for row in rows), default=None)
+
+
+def _rows(records):
+    for r in records:
+        created = r.get("created") or ""
+        yield (r["id"], r.get("task_id"), r.get("platform") or "", r.get("task_type"),
+               int(r.get("cost_cents") or 0), created[:10], created)
+
+
+def sync(conn, client=None, since=None, until=None, platform=None, window_days=1,
+         concurrency=4, page_size=100):
+    """增量同步消费记录,返回 (新增条数, 新的高水位日期)"""
+    client = client or get_client()
+    today = datetime.date.today().isoformat()
+    until = until or today
+    hwm = _high_water_mark(conn, platform)
+    start = since or hwm or (datetime.date.today() - datetime.timedelta(days=DEFAULT_LOOKBACK_DAYS)).isoformat()
+    windows = date_windows(start, until, window_days)
+    print(f"同步 {start} ~ {until},共 {len(windows)} 个窗口(上次同步到: {hwm or '无'})")
+
+    inserted = 0
+    latest = hwm
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(fetch_window, client, s, e, platform, page_size): (s, e) for s, e in windows}
+        for future in as_completed(futures):
+            records = future.result()
+            with conn:
+                before = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO consumption VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 _rows(records))
+                inserted += conn.total_changes - before
+            days = [r["created"][:10] for r in records if r.get("created")]
+            if days:
+                latest = max(latest or "", *days)
+
+    # 高水位不超过今天:今天的记录还会继续产生,下次从今天重新拉取
+    latest = min(latest or until, today)
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (_hwm_key(platform), latest))
+        _backfill_task_costs(conn)
+    return inserted, latest
+
+
+def _backfill_task_costs(conn):
+    has_tasks = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks'").fetchone()
+    if has_tasks:
+        conn.execute(
+            "UPDATE tasks SET cost_cents = (SELECT SUM(cost_cents) FROM consumption c WHERE c.task_id = tasks.task_id)"
+            " WHERE task_id IN (SELECT task_id FROM consumption)")
+
+
+def rollup(conn, by=("platform",), since=None, until=None, platform=None):
+    """按 platform / day / task_type 的任意组合汇总费用"""
+    columns = [c for c in by if c in ROLLUP_COLUMNS]
+    if not columns or len(columns) != len(by):
+        raise ValueError(f"汇总维度只能是 {', '.join(sorted(ROLLUP_COLUMNS))}")
+    clauses, params = [], []
+    if since:
+        clauses.append("day >= ?")
+        params.append(since)
+    if until:
+        clauses.append("day <= ?")
+        params.append(until)
+    if platform:
+        clauses.append("platform = ?")
+        params.append(platform)
+    group = ", ".join(columns)
+    sql = f"SELECT {group}, COUNT(*) AS records, SUM(cost_cents) AS cost_cents FROM consumption"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" GROUP BY {group} ORDER BY {group}"
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="消费记录增量同步和费用汇总")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = sub.add_parser("sync", help="增量同步消费记录")
+    sync_parser.add_argument("--since", help="起始日期 YYYY-MM-DD,默认从上次高水位开始")
+    sync_parser.add_argument("--until", help="结束日期 YYYY-MM-DD,默认今天")
+    sync_parser.add_argument("--platform")
+    sync_parser.add_argument("--window-days", type=int, default=1)
+    sync_parser.add_argument("--concurrency", type=int, default=4)
+
+    report_parser = sub.add_parser("report", help="费用汇总")
+    report_parser.add_argument("--by", default="platform", help="逗号分隔: platform,day,task_type")
+    report_parser.add_argument("--since")
+    report_parser.add_argument("--until")
+    report_parser.add_argument("--platform")
+    args = parser.parse_args()
+
+    conn = open_db(args.db)
+    try:
+        if args.command == "sync":
+            inserted, hwm = sync(conn, since=args.since, until=args.until, platform=args.platform,
+                                 window_days=args.window_days, concurrency=args.concurrency)
+            print(f"新增 {inserted} 条记录,高水位: {hwm}")
+        else:
+            by = tuple(c.strip() for c in args.by.split(",") if c.strip())
+            rows = rollup(conn, by, args.since, args.until, args.platform)
+            total = 0
+            for row in rows:
+                labels = "  ".join(f"{row[c] or '-':<12}" for c in by)
+                print(f"{labels}  {row['records']:>7} 条  ¥{row['cost_cents'] / 100:>10.2f}")
+                total += row["cost_cents"]
+            print(f"\n合计: ¥{total / 100:.2f}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
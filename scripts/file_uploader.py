@@ -0,0 +1,244 @@
+"""流式 multipart 文件上传,带内容哈希缓存
+
+requests 的 files= 会把整个文件拼进内存中的请求体;这里改为边读边发:
+MultipartFileStream 按块从磁盘读取文件并拼接 multipart 边界,
+请求体长度预先算好,以 Content-Length(而非 chunked)发送。
+
+- 发送前按 API 文档校验扩展名和 100 MB 大小限制
+- 多个文件并发上传
+- 以文件内容 sha256 缓存上传结果,同一张参考图不会重复上传
+
+用法:
+    python scripts/file_uploader.py reference.jpg clip.mp4
+"""
+
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api_client import get_client
+from rate_limiter import DailyQuotaExceeded
+from response_normalizer import normalize
+
+MAX_FILE_SIZE = 100 * 1024 * 1024
+ALLOWED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp",
+    ".mp4", ".mov", ".avi", ".webm",
+}
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".upload_cache.json")
+
+
+class UploadError(Exception):
+    """文件校验或上传失败"""
+
+
+def validate_file(path):
+    """按文档的文件限制校验,返回文件大小"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise UploadError(f"不支持的格式 {ext or '(无扩展名)'},支持: {', '.join(sorted(ALLOWED_EXTENSIONS))}")
+    size = os.path.getsize(path)
+    if size > MAX_FILE_SIZE:
+        raise UploadError(f"文件过大: {size / 1024 / 1024:.1f} MB,上限 100 MB")
+    if size == 0:
+        raise UploadError("文件为空")
+    return size
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class MultipartFileStream:
+    """只读的 multipart/form-data 请求体,按需从磁盘读取文件内容
+
+    提供 read / tell / seek / __len__,requests 据此设置 Content-Length,
+    http.client 按块读取发送;重试前 seek(0) 即可重新发送。
+    """
+
+    def __init__(self, path, field="file", filename=None, content_type=None):
+        self.path = path
+        self.boundary = uuid.uuid4().hex
+        filename = filename or os.path.basename(path)
+        content_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        quoted = filename.replace("\\", "\\\\").replace('"', '\\"')
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{quoted}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+        self._file_size = os.path.getsize(path)
+        self._length = len(self._head) + self._file_size + len(self._tail)
+        self._file = open(path, "rb")
+        self._pos = 0
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._length
+        self._pos = max(0, min(offset, self._length))
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._pos
+        parts = []
+        head_end = len(self._head)
+        file_end = head_end + self._file_size
+        while size > 0 and self._pos < self._length:
+            if self._pos < head_end:
+                block = self._head[self._pos:self._pos + size]
+            elif self._pos < file_end:
+                self._file.seek(self._pos - head_end)
+                block = self._file.read(min(size, file_end - self._pos))
+            else:
+                start = self._pos - file_end
+                block = self._tail[start:start + size]
+            if not block:
+                break
+            parts.append(block)
+            self._pos += len(block)
+            size -= len(block)
+        return b"".join(parts)
+
+    def close(self):
+        self._file.close()
+
+
+class FileUploader:
+    """并发上传器,上传结果按内容哈希缓存到 JSON 文件"""
+
+    def __init__(self, client=None, cache_path=DEFAULT_CACHE, concurrency=3, max_age=None):
+        self.client = client or get_client()
+        self.cache_path = cache_path
+        self.concurrency = concurrency
+        self.max_age = max_age
+        self.cache = {}
+        self._lock = threading.Lock()
+        self._inflight = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                self.cache = json.load(f)
+
+    def _cached(self, digest):
+        entry = self.cache.get(digest)
+        if entry and (self.max_age is None or time.time() - entry["uploaded_at"] < self.max_age):
+            return entry
+        return None
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        tmp = f"{self.cache_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.cache, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.cache_path)
+
+    def upload(self, path):
+        """上传单个文件,返回 {url, key, size, sha256, cached};失败时抛出 UploadError"""
+        size = validate_file(path)
+        digest = file_sha256(path)
+
+        with self._lock:
+            entry = self._cached(digest)
+            if entry:
+                return {**entry, "cached": True}
+            # 同一内容正在上传时,等待那次上传的结果
+            event = self._inflight.get(digest)
+            owner = event is None
+            if owner:
+                event = self._inflight[digest] = threading.Event()
+        if not owner:
+            event.wait()
+            with self._lock:
+                entry = self._cached(digest)
+            if entry:
+                return {**entry, "cached": True}
+            return self.upload(path)
+
+        try:
+            entry = self._send(path, size, digest)
+            with self._lock:
+                self.cache[digest] = entry
+                self._save_cache()
+            return {**entry, "cached": False}
+        finally:
+            with self._lock:
+                self._inflight.pop(digest, None)
+            event.set()
+
+    def _send(self, path, size, digest):
+        body = MultipartFileStream(path)
+        try:
+            response = self.client.request("upload", "/api/upload/file", data=body,
+                                           headers={"Content-Type": body.content_type})
+        finally:
+            body.close()
+        if response.status_code != 200:
+            raise UploadError(f"上传失败 HTTP {response.status_code}: {response.text[:200]}")
+        result = normalize("upload", response.json())
+        if not result.ok or not result.asset_urls:
+            raise UploadError(f"上传失败: {result.error_message or response.text[:200]}")
+        return {"url": result.asset_urls[0], "key": (result.details or {}).get("key"),
+                "size": size, "sha256": digest, "uploaded_at": time.time()}
+
+    def upload_many(self, paths):
+        """并发上传多个文件,返回 {path: 结果或 UploadError}
+
+        单个文件的网络错误、今日配额用完等都记为该文件的 UploadError,不影响其他文件。
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {path: executor.submit(self.upload, path) for path in paths}
+            for path, future in futures.items():
+                try:
+                    results[path] = future.result()
+                except (UploadError, OSError, requests.RequestException, DailyQuotaExceeded) as e:
+                    results[path] = e if isinstance(e, UploadError) else UploadError(f"{type(e).__name__}: {e}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式上传文件到 /api/upload/file")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--no-cache", action="store_true", help="忽略并不写入上传缓存")
+    args = parser.parse_args()
+
+    uploader = FileUploader(cache_path=None if args.no_cache else DEFAULT_CACHE,
+                            concurrency=args.concurrency)
+    for path, result in uploader.upload_many(args.files).items():
+        if isinstance(result, UploadError):
+            print(f"❌ {path}: {result}")
+        else:
+            mark = "♻️ 缓存" if result["cached"] else "✅ 上传"
+            print(f"{mark} {path} -> {result['url']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""API 调用的分阶段耗时埋点,按 trace_id / task_id / platform 关联
+
+记录的阶段(phase):
+- connect: 新建连接的耗时,拆分为 tcp(含 DNS)和 tls,复用连接时不产生
+- throttle: 在本地限流器上等待令牌的时间
+- submit / poll / balance / upload / consumption: 单次 HTTP 请求(每次重试单独记录)
+- queued / processing: 任务在平台侧各状态停留的时间(按轮询观测,精度受轮询间隔限制)
+- time_to_succeeded / time_to_failed / ...: 从提交到终态的总耗时
+- download: 结果资源下载
+
+每个阶段按 (phase, platform) 累计到进程内的固定桶直方图;开启 JSONL 时每个 span 另写一行,
+可用 Prometheus 文本格式导出直方图。
+
+默认关闭: 模块级 recorder 为 None,埋点处只做一次 None 判断。
+设置环境变量 AI_STUDIO_TRACE=<jsonl 路径> 或调用 enable() 开启。
+
+用法:
+    AI_STUDIO_TRACE=traces.jsonl python scripts/batch_runner.py jobs.jsonl
+    python scripts/instrumentation.py report traces.jsonl --prometheus metrics.prom
+    python scripts/instrumentation.py timeline traces.jsonl <task_id 或 trace_id>
+"""
+
+import argparse
+import atexit
+import bisect
+import json
+import os
+import re
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 直方图桶上界(秒),覆盖毫秒级请求到半小时的视频任务
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+           60.0, 120.0, 300.0, 600.0, 1800.0)
+ENDPOINT_PHASES = {"task": "poll"}
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled", "timeout"}
+PLATFORM_PATH = re.compile(r"^/api/(\w+)/(?:images|videos|music|tasks)$")
+METRIC = "ai_studio_phase_seconds"
+
+recorder = None
+
+
+class Histogram:
+    """固定桶直方图,桶计数不累加,导出时再转为 Prometheus 的累计格式"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """按桶内线性插值估算分位数"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return low + (high - low) * (rank - cumulative) / n
+            cumulative += n
+        return BUCKETS[-1]
+
+
+class Recorder:
+    """收集 span,维护直方图和各任务的状态时间线"""
+
+    def __init__(self, jsonl_path=None):
+        self.jsonl_path = jsonl_path
+        self.histograms = {}
+        self.responses = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+
+    def record(self, phase, duration, platform=None, task_id=None, trace_id=None, **fields):
+        span = {"ts": round(time.time(), 6), "phase": phase, "duration": round(duration, 6),
+                "platform": platform, "task_id": task_id, "trace_id": trace_id}
+        span.update(fields)
+        key = (phase, platform or "")
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(duration)
+            if self._file is not None:
+                self._file.write(json.dumps(span, ensure_ascii=False, separators=(",", ":")) + "\n")
+        return span
+
+    def connected(self, host, tcp, tls):
+        """由 TimedHTTPAdapter 的连接在建立后调用;耗时同时挂到当前线程,供随后的请求 span 使用"""
+        self._local.connect = tcp + tls
+        self.record("connect", tcp + tls, host=host, tcp=round(tcp, 6), tls=round(tls, 6))
+
+    def take_connect(self):
+        value = getattr(self._local, "connect", 0.0)
+        self._local.connect = 0.0
+        return value
+
+    def request(self, endpoint, path, payload, response, duration, attempt=0, error=None):
+        """ApiClient.request 每次发送后调用;submit 成功时开始跟踪该任务"""
+        match = PLATFORM_PATH.match(path)
+        platform = match.group(1) if match else None
+        task_id = (payload or {}).get("task_id")
+        trace_id = None
+        status_code = response.status_code if response is not None else None
+        if response is not None and "json" in response.headers.get("Content-Type", ""):
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if isinstance(body, dict):
+                task_id = task_id or body.get("task_id")
+                trace_id = body.get("trace_id")
+        phase = ENDPOINT_PHASES.get(endpoint, endpoint)
+        with self._lock:
+            code = str(status_code or error)
+            self.responses[(phase, code)] = self.responses.get((phase, code), 0) + 1
+            if phase == "submit" and status_code == 200 and task_id:
+                now = time.perf_counter()
+                self._tasks[task_id] = {"platform": platform, "trace_id": trace_id, "submitted": now,
+                                        "status": "pending", "since": now}
+            elif task_id in self._tasks:
+                trace_id = trace_id or self._tasks[task_id]["trace_id"]
+        self.record(phase, duration, platform, task_id, trace_id, status_code=status_code,
+                    attempt=attempt, connect=round(self.take_connect(), 6), error=error)
+
+    def throttled(self, endpoint, path, waited):
+        match = PLATFORM_PATH.match(path)
+        self.record("throttle", waited, match.group(1) if match else None, endpoint=endpoint)
+
+    def task_status(self, platform, task_id, status):
+        """轮询器每观测到一次状态调用一次,状态变化时记录上一状态的停留时间"""
+        now = time.perf_counter()
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                # 续跑等场景没有看到提交,从第一次观测开始计时
+                if status not in TERMINAL_STATUSES:
+                    self._tasks[task_id] = {"platform": platform, "trace_id": None, "submitted": None,
+                                            "status": status, "since": now}
+                return
+            if status == task["status"]:
+                return
+            previous, since = task["status"], task["since"]
+            task["status"], task["since"] = status, now
+            if status in TERMINAL_STATUSES:
+                del self._tasks[task_id]
+        self.record(previous, now - since, platform, task_id, task["trace_id"])
+        if status in TERMINAL_STATUSES and task["submitted"] is not None:
+            self.record(f"time_to_{status}", now - task["submitted"], platform, task_id, task["trace_id"])
+
+    def download(self, url, name, size, duration, status):
+        self.record("download", duration, name=name, url=url, bytes=size, status=status)
+
+    def summary(self):
+        """[(phase, platform, count, mean, p50, p95, p99)],按阶段排序"""
+        with self._lock:
+            items = sorted(self.histograms.items())
+        return [(phase, platform, h.count, h.sum / h.count,
+                 h.quantile(0.5), h.quantile(0.95), h.quantile(0.99))
+                for (phase, platform), h in items]
+
+    def to_prometheus(self):
+        lines = [f"# HELP {METRIC} Duration of relay API phases.", f"# TYPE {METRIC} histogram"]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            responses = sorted(self.responses.items())
+        for (phase, platform), h in histograms:
+            labels = f'phase="{phase}",platform="{platform}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h.counts):
+                cumulative += n
+                lines.append(f'{METRIC}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC}_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"{METRIC}_sum{{{labels}}} {h.sum}")
+            lines.append(f"{METRIC}_count{{{labels}}} {h.count}")
+        lines.append("# HELP ai_studio_responses_total Relay API responses by phase and status code.")
+        lines.append("# TYPE ai_studio_responses_total counter")
+        for (phase, code), n in responses:
+            lines.append(f'ai_studio_responses_total{{phase="{phase}",code="{code}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """写成 node_exporter textfile collector 可读取的文件(先写临时文件再改名)"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def enable(jsonl_path=None):
+    """开启埋点,返回全局 Recorder"""
+    global recorder
+    if recorder is None:
+        recorder = Recorder(jsonl_path)
+        atexit.register(recorder.close)
+    return recorder
+
+
+def disable():
+    global recorder
+    if recorder is not None:
+        recorder.close()
+        recorder = None
+
+
+class _TimedConnect:
+    """记录新建连接的 TCP(含 DNS)和 TLS 握手耗时"""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        sock = super()._new_conn()
+        self._tcp_time = time.perf_counter() - start
+        return sock
+
+    def connect(self):
+        rec = recorder
+        if rec is None:
+            return super().connect()
+        self._tcp_time = 0.0
+        start = time.perf_counter()
+        super().connect()
+        total = time.perf_counter() - start
+        rec.connected(self.host, self._tcp_time, max(0.0, total - self._tcp_time))
+
+
+class TimedHTTPConnection(_TimedConnect, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnect, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """连接池使用带计时的连接类,其余行为与 HTTPAdapter 相同"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool,
+        }
+
+
+def load_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="埋点数据汇总")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report_parser = sub.add_parser("report", help="按阶段和平台汇总耗时分布")
+    report_parser.add_argument("jsonl")
+    report_parser.add_argument("--prometheus", help="同时写出 Prometheus 文本格式")
+    timeline_parser = sub.add_parser("timeline", help="按 task_id 或 trace_id 列出一个任务的全部 span")
+    timeline_parser.add_argument("jsonl")
+    timeline_parser.add_argument("id")
+    args = parser.parse_args()
+
+    spans = load_spans(args.jsonl)
+    if args.command == "timeline":
+        matched = sorted((s for s in spans if args.id in (s.get("task_id"), s.get("trace_id"))),
+                         key=lambda s: s["ts"] - s["duration"])
+        if not matched:
+            raise SystemExit(f"没有与 {args.id} 关联的 span")
+        start = matched[0]["ts"] - matched[0]["duration"]
+        for s in matched:
+            offset = s["ts"] - s["duration"] - start
+            extra = f" HTTP {s['status_code']}" if s.get("status_code") else ""
+            print(f"+{offset:8.3f}s  {s['phase']:<18} {s['duration'] * 1000:10.1f} ms{extra}")
+        return
+
+    # JSONL 里有原始耗时,直接算精确分位数;直方图只用于导出
+    rec = Recorder()
+    groups = {}
+    for s in spans:
+        rec.record(s["phase"], s["duration"], s.get("platform"))
+        groups.setdefault((s["phase"], s.get("platform") or ""), []).append(s["duration"])
+    print(f"{'阶段':<18} {'平台':<10} {'次数':>6} {'平均':>10} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for (phase, platform), values in sorted(groups.items()):
+        values.sort()
+        stats = [sum(values) / len(values)] + [values[min(len(values) - 1, int(q * len(values)))]
+                                                for q in (0.5, 0.95, 0.99)]
+        cells = " ".join(f"{v * 1000:8.1f}ms" for v in stats)
+        print(f"{phase:<18} {platform or '-':<10} {len(values):>6} {cells}")
+    if args.prometheus:
+        rec.write_prometheus(args.prometheus)
+        print(f"\nPrometheus 指标已写入: {args.prometheus}")
+
+
+if os.environ.get("AI_STUDIO_TRACE"):
+    enable(os.environ["AI_STUDIO_TRACE"])
+
+
+if __name__ == "__main__":
+    main()
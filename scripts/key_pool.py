@@ -0,0 +1,294 @@
+"""多 API Key 池:把提交分摊到多个账户,吞吐随 key 数线性增长
+
+每个 key 有独立的 ApiClient 和 RateLimiter,配额和余额来自各自的 /api/account/balance。
+- 提交:在有配额且未被停用的 key 中选负载最轻的(下一个令牌的等待时间 + 在途提交数)
+- 查询:任务固定用创建它的 key 查询(其他 key 查不到该任务);
+  未记录的 task_id(例如从检查点续跑)依次尝试各 key,查到后固定下来
+- 失败转移:401 永久停用该 key,402 停用到下次余额刷新确认有余额,
+  429 按 Retry-After 暂停该 key,然后换下一个 key 重新提交
+
+KeyPool 提供与 ApiClient 相同的 create_task / query_task / balance / request 等方法,
+可以直接传给 batch_runner、task_poller 和 result_cache。
+
+key 从环境变量 AI_STUDIO_API_KEYS 读取(逗号分隔),未设置时退回单个 AI_STUDIO_API_KEY。
+
+用法:
+    AI_STUDIO_API_KEYS=sk-a,sk-b python scripts/key_pool.py    # 查看各 key 的余额和配额
+"""
+
+import os
+import threading
+import time
+
+from api_client import API_KEY, ApiClient, _retry_after
+from rate_limiter import DailyQuotaExceeded, RateLimiter
+from response_normalizer import normalize
+
+# 这些状态码说明问题出在当前 key 上,换一个 key 重新提交即可
+FAILOVER_STATUS = {401, 402, 429}
+
+
+class PooledKey:
+    """池中单个 key 的客户端、配额和状态"""
+
+    def __init__(self, api_key, client):
+        self.api_key = api_key
+        self.label = mask_key(api_key)
+        self.client = client
+        self.limiter = client.rate_limiter
+        self.balance_cents = None
+        self.disabled = None  # 停用原因:invalid / no_balance
+        self.inflight = 0
+        self.submitted = 0
+        self.failovers = {}
+
+    def wait_time(self):
+        """被选中后预计需要等待的秒数,不可用时返回 None"""
+        if self.disabled is not None:
+            return None
+        wait = self.limiter.available_in()
+        if wait is None:
+            return None
+        return wait + self.inflight * 60.0 / self.limiter.per_minute
+
+    def stats(self):
+        return {
+            "key": self.label,
+            "disabled": self.disabled,
+            "balance_cents": self.balance_cents,
+            "submitted": self.submitted,
+            "failovers": dict(self.failovers),
+            **{k: v for k, v in self.limiter.stats().items() if k in ("per_minute", "remaining_today", "avg_wait")},
+        }
+
+
+class KeyPool:
+    """多个 API Key 组成的客户端池
+
+    api_keys: key 列表
+    refresh_interval: 从余额接口刷新各 key 配额和余额的间隔(秒)
+    per_minute: 首次刷新前假定的每分钟配额
+    max_rounds: 所有 key 都返回 429 时最多重新轮几遍
+    client_options: 传给每个 ApiClient 的参数(base_url、pool_size、timeouts 等)
+    """
+
+    def __init__(self, api_keys, refresh_interval=300, per_minute=20, max_rounds=3, **client_options):
+        if not api_keys:
+            raise ValueError("至少需要一个 API Key")
+        self.refresh_interval = refresh_interval
+        self.max_rounds = max_rounds
+        self.keys = []
+        for api_key in dict.fromkeys(api_keys):
+            client = ApiClient(api_key=api_key, **client_options)
+            # 限流器不设 source:配额由 KeyPool.refresh 统一刷新,顺便拿到余额
+            client.rate_limiter = RateLimiter(per_minute=per_minute)
+            self.keys.append(PooledKey(api_key, client))
+        self.base_url = self.keys[0].client.base_url
+        self.refreshed_at = None
+        self._owners = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **options):
+        keys = [k.strip() for k in os.environ.get("AI_STUDIO_API_KEYS", "").split(",") if k.strip()]
+        return cls(keys or [API_KEY], **options)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def refresh(self):
+        """查询每个 key 的余额和配额;无效的 key 停用,余额恢复的 key 重新启用"""
+        for key in self.keys:
+            try:
+                response = key.client.balance()
+            except Exception as e:
+                print(f"⚠️ 刷新 {key.label} 余额失败: {e}")
+                continue
+            if response.status_code == 401:
+                key.disabled = "invalid"
+                continue
+            if response.status_code != 200:
+                continue
+            record = normalize("balance", response.json()).details or {}
+            key.limiter.update(record.get("rate_limit") or {})
+            key.balance_cents = record.get("balance_cents")
+            if key.disabled == "no_balance" and (key.balance_cents or 0) > 0:
+                key.disabled = None
+        self.refreshed_at = time.monotonic()
+
+    def _maybe_refresh(self):
+        if self.refreshed_at is None:
+            # 首次刷新前配额未知,其他线程要等它完成,否则会按默认配额预定令牌而长时间等待
+            with self._refresh_lock:
+                if self.refreshed_at is None:
+                    self.refresh()
+            return
+        with self._lock:
+            now = time.monotonic()
+            due = self.refreshed_at is None or now - self.refreshed_at >= self.refresh_interval
+            if due:
+                self.refreshed_at = now
+        if due:
+            self.refresh()
+
+    def _pick(self, exclude=()):
+        """选出等待时间最短的可用 key 并计入在途数,没有可用 key 时返回 None"""
+        with self._lock:
+            best, best_wait = None, None
+            for key in self.keys:
+                if key in exclude:
+                    continue
+                wait = key.wait_time()
+                if wait is not None and (best_wait is None or wait < best_wait):
+                    best, best_wait = key, wait
+            if best is not None:
+                best.inflight += 1
+            return best
+
+    def submit(self, path, payload):
+        """按负载选择 key 提交,遇到 401/402/429 换下一个 key;返回 (Response, PooledKey)"""
+        self._maybe_refresh()
+        tried = []
+        rounds = 1
+        response = None
+        while True:
+            key = self._pick(exclude=tried)
+            if key is None:
+                if response is not None:
+                    return response, tried[-1]
+                raise DailyQuotaExceeded("所有 API Key 都已停用或用完今日配额")
+            try:
+                # 429 由池换 key 处理,不在单个 key 上原地重试
+                response = key.client.request("submit", path, json=payload, max_retries=0)
+            except DailyQuotaExceeded:
+                # 选中后被其他线程用掉了最后的配额
+                tried.append(key)
+                continue
+            finally:
+                with self._lock:
+                    key.inflight -= 1
+            tried.append(key)
+            status = response.status_code
+            if status not in FAILOVER_STATUS:
+                if status == 200:
+                    key.submitted += 1
+                return response, key
+            key.failovers[status] = key.failovers.get(status, 0) + 1
+            if status == 401:
+                key.disabled = "invalid"
+                print(f"⚠️ {key.label} 无效(401),已停用")
+            elif status == 402:
+                key.disabled = "no_balance"
+                key.balance_cents = 0
+                print(f"⚠️ {key.label} 余额不足(402),停用到下次余额刷新")
+            else:
+                key.limiter.throttled(_retry_after(response))
+            if not any(k not in tried and k.wait_time() is not None for k in self.keys):
+                # 可用的 key 都试过了:最后是 429 时再轮一遍,交给限流器在负载最轻的 key 上排队;
+                # 停用或用完今日配额的 key 不算在内
+                if status == 429 and rounds < self.max_rounds and any(k.wait_time() is not None for k in self.keys):
+                    tried = []
+                    rounds += 1
+                    continue
+                return response, key
+
+    def create_task(self, platform, kind, payload):
+        """创建生成任务,并记住创建它的 key"""
+        response, key = self.submit(f"/api/{platform}/{kind}", payload)
+        if response.status_code == 200:
+            try:
+                task_id = response.json().get("task_id")
+            except ValueError:
+                task_id = None
+            if task_id:
+                with self._lock:
+                    self._owners[task_id] = key
+        return response
+
+    def owner(self, task_id):
+        """创建该任务的 key 标签,未知时返回 None"""
+        key = self._owners.get(task_id)
+        return key.label if key is not None else None
+
+    def query_task(self, platform, task_id):
+        """查询任务状态"""
+        return self.request("task", f"/api/{platform}/tasks", json={"task_id": task_id})
+
+    def _query(self, path, json, **kwargs):
+        """用创建任务的 key 查询;未知任务依次尝试各 key,找到后固定"""
+        task_id = json.get("task_id")
+        key = self._owners.get(task_id)
+        if key is not None:
+            return key.client.request("task", path, json=json, **kwargs)
+        response = None
+        for key in self.keys:
+            if key.disabled == "invalid":
+                continue
+            response = key.client.request("task", path, json=json, **kwargs)
+            if response.status_code == 401:
+                key.disabled = "invalid"
+            if response.status_code not in (401, 404):
+                if response.status_code == 200:
+                    with self._lock:
+                        self._owners[task_id] = key
+                return response
+            response.close()
+        return response
+
+    def _any(self):
+        key = self._pick()
+        if key is None:
+            raise DailyQuotaExceeded("所有 API Key 都已停用或用完今日配额")
+        with self._lock:
+            key.inflight -= 1
+        return key.client
+
+    def request(self, endpoint, path, json=None, **kwargs):
+        """与 ApiClient.request 相同;提交和查询分别走负载均衡和固定 key"""
+        if endpoint == "submit":
+            return self.submit(path, json)[0]
+        if endpoint == "task" and json:
+            return self._query(path, json, **kwargs)
+        return self._any().request(endpoint, path, json=json, **kwargs)
+
+    def balance(self):
+        """第一个可用 key 的余额;各 key 的余额见 stats()"""
+        return self._any().balance()
+
+    def consumption(self, *args, **kwargs):
+        return self._any().consumption(*args, **kwargs)
+
+    def upload_file(self, files):
+        return self._any().upload_file(files)
+
+    def stats(self):
+        return [key.stats() for key in self.keys]
+
+    def close(self):
+        for key in self.keys:
+            key.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def mask_key(api_key):
+    return f"{api_key[:5]}…{api_key[-4:]}" if len(api_key) > 12 else f"{api_key[:3]}…"
+
+
+def main():
+    with KeyPool.from_env() as pool:
+        pool.refresh()
+        print(f"{'key':<14}{'状态':<12}{'余额':>10}{'每分钟':>8}{'今日剩余':>10}")
+        for s in pool.stats():
+            balance = f"¥{s['balance_cents'] / 100:.2f}" if s["balance_cents"] is not None else "-"
+            print(f"{s['key']:<14}{s['disabled'] or '可用':<12}{balance:>10}{s['per_minute']:>8}"
+                  f"{s['remaining_today'] if s['remaining_today'] is not None else '-':>10}")
+
+
+if __name__ == "__main__":
+    main()
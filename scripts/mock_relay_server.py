@@ -0,0 +1,387 @@
+"""本地模拟的 AI Studio 中转 API,用于离线基准测试
+
+任务生命周期按创建后经过的时间推进: queued -> processing -> succeeded,
+各平台的完成耗时可以分别指定(platform_durations)。error_rate 大于 0 时,
+POST 请求按该比例随机返回 503,用于观察客户端的错误率和重试行为。
+响应格式与实际 API 保持一致(嵌套的 response.success / response.data),
+同时带上文档中的顶层 status 字段。
+
+指定 static_dir 时,GET /files/<文件名> 以静态文件方式提供目录中的文件,
+支持单段 Range 请求,用于测试下载器的断点续传。
+
+指定 accounts({api_key: {per_minute, per_day, balance_cents, burst}})时按 key 鉴权并分别计量:
+未知 key 返回 401,超过每分钟速率或每日次数返回 429(带 Retry-After),
+余额不足以支付一次提交返回 402;任务只能用创建它的 key 查询,其他 key 查询返回 404。
+
+用法:
+    python scripts/mock_relay_server.py --port 8765 --task-duration 5
+"""
+
+import argparse
+import datetime
+import json
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+# 未配置 accounts 时不校验 key,连接模拟服务的客户端用这个占位 key
+MOCK_API_KEY = "sk-mock-local"
+
+CREATE_PATH = re.compile(r"^/api/(\w+)/(images|videos|music)$")
+TASK_PATH = re.compile(r"^/api/(\w+)/tasks$")
+
+
+class MockState:
+    """模拟服务端的任务表和统计"""
+
+    def __init__(self, task_duration=3.0, queue_time=None, latency=0.0, static_dir=None,
+                 consumption_records=(), page_size=100, platform_durations=None, error_rate=0.0,
+                 accounts=None, submit_cost=10):
+        self.task_duration = task_duration
+        self.platform_durations = dict(platform_durations or {})
+        self.error_rate = error_rate
+        self.static_dir = static_dir
+        self.consumption_records = list(consumption_records)
+        self.page_size = page_size
+        self.queue_time = queue_time
+        self.latency = latency
+        self.tasks = {}
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.submit_cost = submit_cost
+        self.accounts = None
+        if accounts is not None:
+            now = time.monotonic()
+            self.accounts = {
+                key: {"per_minute": a.get("per_minute", 20), "per_day": a.get("per_day", 500),
+                      "balance_cents": a.get("balance_cents", 99500), "used_today": 0,
+                      "burst": a.get("burst", 2), "submitted": 0, "tokens": 1.0, "updated": now}
+                for key, a in accounts.items()
+            }
+
+    def check_account(self, key, endpoint):
+        """按 key 鉴权和计量,放行返回 None,否则返回 (状态码, 错误体, 响应头)"""
+        if self.accounts is None:
+            return None
+        with self.lock:
+            account = self.accounts.get(key)
+            if account is None:
+                return 401, _error("UNAUTHORIZED", "API Key 无效"), {}
+            if endpoint == "balance":
+                return None
+            if account["used_today"] >= account["per_day"]:
+                return 429, _error("DAILY_LIMIT_EXCEEDED", "今日请求次数已用完"), {"Retry-After": "3600"}
+            # 令牌桶;容量比客户端 RateLimiter 的 1 略大,容忍请求在网络上的先后抖动
+            now = time.monotonic()
+            rate = account["per_minute"] / 60.0
+            account["tokens"] = min(account["burst"], account["tokens"] + (now - account["updated"]) * rate)
+            account["updated"] = now
+            if account["tokens"] < 1.0:
+                retry_after = (1.0 - account["tokens"]) / rate
+                return 429, _error("RATE_LIMIT_EXCEEDED", "请求过于频繁"), {"Retry-After": f"{retry_after:.3f}"}
+            if endpoint == "submit" and account["balance_cents"] < self.submit_cost:
+                return 402, _error("INSUFFICIENT_BALANCE", "余额不足"), {}
+            account["tokens"] -= 1.0
+            account["used_today"] += 1
+            if endpoint == "submit":
+                account["balance_cents"] -= self.submit_cost
+                account["submitted"] += 1
+        return None
+
+    def create_task(self, platform, kind, payload, key=None):
+        task_id = str(uuid.uuid4())
+        duration = self.platform_durations.get(platform, self.task_duration)
+        with self.lock:
+            self.tasks[task_id] = {
+                "platform": platform,
+                "kind": kind,
+                "request": payload,
+                "created_at": time.time(),
+                "duration": duration,
+                "key": key,
+                "queue_time": duration / 3 if self.queue_time is None else self.queue_time,
+                "trace_id": uuid.uuid4().hex,
+            }
+        return task_id
+
+    def task_status(self, task):
+        elapsed = time.time() - task["created_at"]
+        if elapsed >= task["duration"]:
+            return "succeeded"
+        if elapsed >= task["queue_time"]:
+            return "processing"
+        return "queued"
+
+    def task_body(self, task_id, key=None):
+        task = self.tasks.get(task_id)
+        if task is None or (self.accounts is not None and task["key"] != key):
+            return None
+        status = self.task_status(task)
+        body = {
+            "id": task_id,
+            "trace_id": task["trace_id"],
+            "type": task["kind"],
+            "created_at": task["created_at"],
+            "status": status,
+            "request": task["request"],
+            "response": {"task_id": task_id, "trace_id": task["trace_id"]},
+        }
+        if status == "succeeded":
+            body["finished_at"] = task["created_at"] + task["duration"]
+            body["response"].update(success=True, data=_result_data(task))
+        return body
+
+
+def _result_data(task):
+    base = f"https://cdn.example.com/mock/{task['platform']}"
+    if task["kind"] == "images":
+        count = int(task["request"].get("count", 1) or 1)
+        return {"imageUrls": [f"{base}/{uuid.uuid4().hex}.png" for _ in range(count)]}
+    if task["kind"] == "videos":
+        return {"videoUrl": f"{base}/{uuid.uuid4().hex}.mp4",
+                "duration": task["request"].get("duration", 5)}
+    return {"audioUrls": [f"{base}/{uuid.uuid4().hex}.mp3"]}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出,不关 Nagle 会与客户端的延迟 ACK 叠加出约 40ms 的等待
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        with state.lock:
+            state.requests += 1
+        if state.latency:
+            time.sleep(state.latency)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(raw) if raw and "json" in self.headers.get("Content-Type", "") else {}
+        except ValueError:
+            return self.send_json(400, _error("INVALID_PARAMETER", "请求体不是合法 JSON"))
+        if state.error_rate and random.random() < state.error_rate:
+            return self.send_json(503, _error("SERVICE_UNAVAILABLE", "模拟的上游错误"))
+
+        api_key = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        match = CREATE_PATH.match(self.path)
+        endpoint = "submit" if match else "balance" if self.path == "/api/account/balance" else "other"
+        denied = state.check_account(api_key, endpoint)
+        if denied is not None:
+            return self.send_json(*denied)
+
+        if match:
+            platform, kind = match.groups()
+            if not payload.get("prompt"):
+                return self.send_json(400, _error("MISSING_REQUIRED_FIELD", "缺少 prompt"))
+            task_id = state.create_task(platform, kind, payload, api_key)
+            return self.send_json(200, {"success": True, "task_id": task_id,
+                                        "trace_id": uuid.uuid4().hex, "data": []})
+
+        match = TASK_PATH.match(self.path)
+        if match:
+            body = state.task_body(payload.get("task_id"), api_key)
+            if body is None:
+                return self.send_json(404, _error("TASK_NOT_FOUND", "任务不存在"))
+            return self.send_json(200, body)
+
+        if self.path == "/api/upload/file":
+            if not raw or "multipart/form-data" not in self.headers.get("Content-Type", ""):
+                return self.send_json(400, _error("MISSING_REQUIRED_FIELD", "缺少 file"))
+            key = f"openapi/mock/{uuid.uuid4().hex}"
+            return self.send_json(200, {"success": True, "trace_id": uuid.uuid4().hex, "data": [{
+                "url": f"https://cdn.example.com/{key}", "key": key, "size": len(raw),
+            }]})
+
+        if self.path == "/api/account/consumption":
+            records = [
+                r for r in state.consumption_records
+                if (not payload.get("start_date") or r["created"][:10] >= payload["start_date"])
+                and (not payload.get("end_date") or r["created"][:10] <= payload["end_date"])
+                and (not payload.get("platform") or r["platform"] == payload["platform"])
+            ]
+            page = int(payload.get("page") or 1)
+            size = int(payload.get("page_size") or state.page_size)
+            return self.send_json(200, {"success": True, "trace_id": uuid.uuid4().hex, "data": [{
+                "total": len(records),
+                "records": records[(page - 1) * size:page * size],
+            }]})
+
+        if self.path == "/api/account/balance":
+            if state.accounts is None:
+                account = {"per_minute": 20, "per_day": 500, "balance_cents": 99500,
+                           "used_today": 0, "submitted": 0}
+                request_count = state.requests
+            else:
+                account = state.accounts[api_key]
+                request_count = account["used_today"]
+            return self.send_json(200, {"success": True, "trace_id": uuid.uuid4().hex, "data": [{
+                "balance_cents": account["balance_cents"],
+                "balance_display": f"¥{account['balance_cents'] / 100:.2f}",
+                "tier": "standard",
+                "tier_name": "标准版",
+                "usage_today": {"request_count": request_count,
+                                "cost_cents": account["submitted"] * state.submit_cost},
+                "rate_limit": {"per_minute": account["per_minute"], "per_day": account["per_day"],
+                               "remaining_today": account["per_day"] - account["used_today"]},
+            }]})
+
+        return self.send_json(404, _error("NOT_FOUND", "资源不存在"))
+
+    def do_GET(self):
+        state = self.server.state
+        with state.lock:
+            state.requests += 1
+        name = unquote(self.path[len("/files/"):]) if self.path.startswith("/files/") else None
+        path = os.path.join(state.static_dir, os.path.basename(name)) if state.static_dir and name else None
+        if path is None or not os.path.isfile(path):
+            return self.send_json(404, _error("NOT_FOUND", "资源不存在"))
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                block = f.read(min(65536, remaining))
+                if not block:
+                    break
+                self.wfile.write(block)
+                remaining -= len(block)
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def fake_consumption_records(count, start_day, days, seed=0):
+    """生成 count 条分布在 start_day 起 days 天内的消费记录"""
+    rng = random.Random(seed)
+    kinds = [("grok", "images"), ("dreamina", "images"), ("kling", "videos"), ("sora", "videos"),
+             ("hailuo", "videos"), ("suno", "music")]
+    start = datetime.datetime.fromisoformat(start_day)
+    records = []
+    for i in range(count):
+        platform, task_type = rng.choice(kinds)
+        created = start + datetime.timedelta(seconds=rng.uniform(0, days * 86400))
+        records.append({
+            "id": f"log-{i:08d}",
+            "task_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "platform": platform,
+            "task_type": task_type,
+            "cost_cents": rng.choice((10, 20, 50, 100, 200)),
+            "created": created.strftime("%Y-%m-%dT%H:%M:%S+08:00"),
+        })
+    records.sort(key=lambda r: r["created"])
+    return records
+
+
+def _error(code, message):
+    return {"success": False, "error": {"code": code, "message": message},
+            "trace_id": uuid.uuid4().hex}
+
+
+class MockRelayServer:
+    """在后台线程中运行的模拟服务,可用作上下文管理器"""
+
+    def __init__(self, host="127.0.0.1", port=0, **state_options):
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = MockState(**state_options)
+        self.thread = None
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 AI Studio 中转 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--task-duration", type=float, default=5.0, help="任务完成耗时(秒)")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的模拟延迟(秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="POST 请求随机返回 503 的比例")
+    parser.add_argument("--static-dir", help="通过 /files/ 提供下载的目录")
+    parser.add_argument("--consumption-records", type=int, default=0, help="生成的模拟消费记录条数")
+    parser.add_argument("--consumption-start", default=datetime.date.today().replace(day=1).isoformat(),
+                        help="模拟消费记录的起始日期")
+    parser.add_argument("--consumption-days", type=int, default=30)
+    args = parser.parse_args()
+
+    records = fake_consumption_records(args.consumption_records, args.consumption_start,
+                                       args.consumption_days)
+    server = MockRelayServer(args.host, args.port, task_duration=args.task_duration,
+                             latency=args.latency, error_rate=args.error_rate, static_dir=args.static_dir,
+                             consumption_records=records)
+    print(f"模拟服务已启动: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""效果展示素材的增量优化
+
+读取 resource_mapping.json,为其中引用的 public/img_video 素材生成:
+- 图片: WebP / AVIF 变体,多个响应式宽度(不放大原图)
+- 视频: 首帧海报图(需要 ffmpeg),再按图片流程生成变体
+- 每个素材一个模糊占位图(内联的 data URI)
+
+多个素材在进程池中并行处理。上次的结果按源文件 sha256 和优化参数缓存,
+源文件大小和修改时间都没变时连哈希都不计算,重跑几乎不耗时。
+输出的清单保持 resource_mapping.json 的结构,并给每个素材路径附上变体信息。
+
+依赖: Pillow(pip install pillow,AVIF 需要 Pillow 11.3+);ffmpeg 可选,缺少时跳过视频海报。
+
+用法:
+    python scripts/optimize_media.py
+    python scripts/optimize_media.py --widths 480,960 --formats webp --jobs 4
+"""
+
+import argparse
+import base64
+import copy
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from PIL import Image, ImageFilter, features
+except ImportError:
+    Image = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUBLIC_DIR = os.path.join(ROOT, "public")
+MAPPING_PATH = os.path.join(ROOT, "resource_mapping.json")
+OUTPUT_URL = "/img_video/optimized"
+OUTPUT_DIR = os.path.join(PUBLIC_DIR, OUTPUT_URL.lstrip("/"))
+CACHE_NAME = ".build_cache.json"
+
+DEFAULT_WIDTHS = (480, 960, 1600)
+DEFAULT_FORMATS = ("webp", "avif")
+QUALITY = {"webp": 80, "avif": 55}
+PLACEHOLDER_WIDTH = 16
+POSTER_OFFSET = 1.0
+# 修改输出逻辑时递增,使旧缓存失效
+VERSION = 1
+
+MEDIA_KEYS = ("original", "effect", "video")
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def collect_sources(mapping):
+    """resource_mapping 中引用的全部素材 URL(去重,保持出现顺序)"""
+    urls = []
+
+    def visit(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in MEDIA_KEYS and isinstance(value, str):
+                    urls.append(value)
+                else:
+                    visit(value)
+        elif isinstance(node, list):
+            for item in node:
+                visit(item)
+
+    visit(mapping)
+    return list(dict.fromkeys(urls))
+
+
+def url_to_path(url):
+    return os.path.join(PUBLIC_DIR, url.lstrip("/"))
+
+
+def extract_poster(ffmpeg, video_path, offset=POSTER_OFFSET):
+    """用 ffmpeg 截取一帧 PNG,返回临时文件路径;视频短于 offset 时退回第一帧"""
+    fd, poster = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    for seek in (offset, 0):
+        subprocess.run([ffmpeg, "-v", "error", "-y", "-ss", str(seek), "-i", video_path,
+                        "-frames:v", "1", poster], capture_output=True)
+        if os.path.getsize(poster) > 0:
+            return poster
+    os.remove(poster)
+    raise RuntimeError(f"无法从 {video_path} 截取海报帧")
+
+
+def _encode(img, fmt, path):
+    if fmt == "webp":
+        img.save(path, "WEBP", quality=QUALITY["webp"], method=4)
+    else:
+        img.save(path, "AVIF", quality=QUALITY["avif"], speed=6)
+
+
+def _placeholder(img):
+    height = max(1, round(img.height * PLACEHOLDER_WIDTH / img.width))
+    tiny = img.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    buf = io.BytesIO()
+    tiny.save(buf, "WEBP", quality=40)
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def optimize_file(url, kind, widths, formats, ffmpeg=None, known_hash=None):
+    """进程池任务: 处理单个素材,返回结果字典
+
+    known_hash 与源文件哈希相同时直接返回 unchanged,不重新生成。
+    """
+    start = time.perf_counter()
+    path = url_to_path(url)
+    digest = file_sha256(path)
+    if digest == known_hash:
+        return {"url": url, "hash": digest, "unchanged": True, "elapsed": time.perf_counter() - start}
+
+    poster = None
+    source = path
+    if kind == "video":
+        poster = extract_poster(ffmpeg, path)
+        source = poster
+    try:
+        with Image.open(source) as img:
+            img.load()
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            full_width, full_height = img.size
+
+            stem = os.path.splitext(os.path.basename(path))[0]
+            out_subdir = os.path.join(OUTPUT_DIR, os.path.basename(os.path.dirname(path)))
+            os.makedirs(out_subdir, exist_ok=True)
+
+            targets = sorted({w for w in widths if w < full_width} | {min(full_width, max(widths))})
+            sources = {fmt: [] for fmt in formats}
+            resized = img
+            # 从大到小缩放,每次以上一个尺寸为源,减少大图重复重采样的开销
+            for width in reversed(targets):
+                height = round(full_height * width / full_width)
+                resized = resized.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+                for fmt in formats:
+                    name = f"{stem}{'-poster' if poster else ''}-{width}.{fmt}"
+                    _encode(resized, fmt, os.path.join(out_subdir, name))
+                    sources[fmt].append({
+                        "width": width, "height": height,
+                        "url": f"{OUTPUT_URL}/{os.path.basename(out_subdir)}/{name}",
+                        "bytes": os.path.getsize(os.path.join(out_subdir, name)),
+                    })
+            placeholder = _placeholder(img)
+    finally:
+        if poster:
+            os.remove(poster)
+
+    for variants in sources.values():
+        variants.sort(key=lambda v: v["width"])
+    return {
+        "url": url, "hash": digest, "unchanged": False, "kind": kind,
+        "width": full_width, "height": full_height, "bytes": os.path.getsize(path),
+        "sources": sources, "placeholder": placeholder,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def _outputs_exist(entry):
+    return all(os.path.exists(url_to_path(v["url"]))
+               for variants in entry["result"]["sources"].values() for v in variants)
+
+
+def load_cache(path):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def build_manifest(mapping, results):
+    """复制 resource_mapping 的结构,在每个素材路径旁加上 <key>_variants"""
+    manifest = copy.deepcopy(mapping)
+
+    def visit(node):
+        if isinstance(node, dict):
+            for key in list(node):
+                value = node[key]
+                if key in MEDIA_KEYS and isinstance(value, str):
+                    result = results.get(value)
+                    if result:
+                        node[f"{key}_variants"] = {
+                            "width": result["width"], "height": result["height"],
+                            "placeholder": result["placeholder"], "sources": result["sources"],
+                        }
+                else:
+                    visit(value)
+        elif isinstance(node, list):
+            for item in node:
+                visit(item)
+
+    visit(manifest)
+    return manifest
+
+
+def best_variant(result):
+    """最大宽度下体积最小的变体;原图比最大输出宽度宽时,它的宽度小于原图"""
+    candidates = [variants[-1] for variants in result["sources"].values() if variants]
+    return min(candidates, key=lambda v: v["bytes"]) if candidates else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为效果展示素材生成 WebP/AVIF、响应式尺寸、海报和占位图")
+    parser.add_argument("--mapping", default=MAPPING_PATH)
+    parser.add_argument("--manifest", default=os.path.join(OUTPUT_DIR, "manifest.json"))
+    parser.add_argument("--widths", default=",".join(map(str, DEFAULT_WIDTHS)))
+    parser.add_argument("--formats", default=",".join(DEFAULT_FORMATS))
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="并行进程数")
+    parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg"), help="ffmpeg 可执行文件路径")
+    parser.add_argument("--force", action="store_true", help="忽略缓存,全部重新生成")
+    args = parser.parse_args()
+
+    if Image is None:
+        raise SystemExit("❌ 需要 Pillow: pip install pillow")
+    widths = tuple(sorted(int(w) for w in args.widths.split(",")))
+    formats = []
+    for fmt in args.formats.split(","):
+        if features.check(fmt):
+            formats.append(fmt)
+        else:
+            print(f"⚠️ 当前 Pillow 不支持 {fmt},跳过该格式")
+    if not formats:
+        raise SystemExit("❌ 没有可用的输出格式")
+
+    with open(args.mapping, encoding="utf-8") as f:
+        mapping = json.load(f)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    cache_path = os.path.join(OUTPUT_DIR, CACHE_NAME)
+    cache = {} if args.force else load_cache(cache_path)
+    config = {"version": VERSION, "widths": list(widths), "formats": formats, "quality": QUALITY}
+
+    started = time.perf_counter()
+    results, jobs, missing = {}, [], []
+    for url in collect_sources(mapping):
+        path = url_to_path(url)
+        if not os.path.isfile(path):
+            missing.append(url)
+            continue
+        kind = "video" if os.path.splitext(path)[1].lower() in (".mp4", ".mov", ".webm") else "image"
+        stat = os.stat(path)
+        entry = cache.get(url)
+        reusable = entry is not None and entry["config"] == config and _outputs_exist(entry)
+        if reusable and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            results[url] = entry["result"]
+            continue
+        if kind == "video" and not args.ffmpeg:
+            continue
+        jobs.append((url, kind, entry["hash"] if reusable else None, stat))
+
+    if not args.ffmpeg:
+        print("⚠️ 未找到 ffmpeg,跳过视频海报")
+    for url in missing:
+        print(f"⚠️ 文件不存在: {url}")
+
+    timings = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(optimize_file, url, kind, widths, formats, args.ffmpeg, known_hash):
+                   (url, stat) for url, kind, known_hash, stat in jobs}
+        for future in as_completed(futures):
+            url, stat = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ {url}: {e}")
+                continue
+            if result.pop("unchanged"):
+                # 内容没变,只是修改时间变了:更新缓存里的 stat 即可
+                entry = cache[url]
+                entry.update(size=stat.st_size, mtime=stat.st_mtime)
+                results[url] = entry["result"]
+                continue
+            elapsed = result.pop("elapsed")
+            digest = result.pop("hash")
+            cache[url] = {"hash": digest, "size": stat.st_size, "mtime": stat.st_mtime,
+                          "config": config, "result": result}
+            results[url] = result
+            timings.append((url, elapsed, result))
+
+    save_json(cache_path, cache)
+    save_json(args.manifest, build_manifest(mapping, results))
+    total_time = time.perf_counter() - started
+
+    # 最大变体与原图同宽时,节省的只是转码的收益;原图更宽时还包含缩小尺寸的收益,分开统计
+    savings = {"same": [0, 0, 0], "capped": [0, 0, 0]}
+    for url, result in results.items():
+        best = best_variant(result)
+        if best and result["kind"] == "image":
+            total = savings["same" if best["width"] == result["width"] else "capped"]
+            total[0] += 1
+            total[1] += result["bytes"]
+            total[2] += best["bytes"]
+
+    if timings:
+        print(f"{'耗时':>8}  {'原始':>16}  {'最优变体':>16}  文件")
+        for url, elapsed, result in sorted(timings, key=lambda item: -item[1]):
+            best = best_variant(result)
+            original = f"{result['bytes'] / 1024:.0f}K@{result['width']}px"
+            optimized = f"{best['bytes'] / 1024:.0f}K@{best['width']}px"
+            print(f"{elapsed:7.2f}s  {original:>16}  {optimized:>16}  {url}")
+    print("=" * 60)
+    print(f"素材 {len(results)} 个: 重新生成 {len(timings)},未变化 {len(results) - len(timings)},"
+          f"缺失 {len(missing)}")
+    labels = {"same": "同尺寸转码", "capped": f"缩到 {max(widths)}px 并转码"}
+    for name, (count, original_bytes, optimized_bytes) in savings.items():
+        if original_bytes:
+            saved = original_bytes - optimized_bytes
+            print(f"{labels[name]}: 图片 {count} 个,原始 {original_bytes / 1024 / 1024:.1f} MB -> "
+                  f"{optimized_bytes / 1024 / 1024:.1f} MB,节省 {saved / 1024 / 1024:.1f} MB ({saved / original_bytes:.0%})")
+    print(f"总耗时 {total_time:.2f}s,清单: {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""客户端令牌桶限流,按账户的 per_minute / per_day 配额控制请求速率
+
+配额来自 /api/account/balance 的 rate_limit 字段,并定期刷新。
+同步调用 acquire(),异步调用 await acquire_async();两者共享同一个桶。
+"""
+
+import asyncio
+import threading
+import time
+
+from response_normalizer import normalize
+
+
+class DailyQuotaExceeded(Exception):
+    """今日剩余请求次数已用完"""
+
+
+class RateLimiter:
+    """令牌桶限流器
+
+    per_minute: 每分钟允许的请求数,决定令牌补充速率
+    burst: 桶容量;默认 1,保证任意 60 秒窗口内不超过 per_minute 次
+    remaining_today: 今日剩余次数,为 None 时不检查日配额
+    refresh_interval: 从余额接口刷新配额的间隔(秒),需设置 source
+    source: 提供 balance() 方法的 ApiClient
+    """
+
+    def __init__(self, per_minute=20, burst=1, per_day=None, remaining_today=None,
+                 refresh_interval=300, source=None):
+        self.burst = burst
+        self.per_day = per_day
+        self.remaining_today = remaining_today
+        self.refresh_interval = refresh_interval
+        self.source = source
+        self.refreshed_at = None
+
+        self._lock = threading.Lock()
+        self._set_rate(per_minute)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+        self.requests = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _set_rate(self, per_minute):
+        self.per_minute = per_minute
+        self._rate = per_minute / 60.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def update(self, rate_limit):
+        """用余额接口返回的 rate_limit 字段更新配额"""
+        with self._lock:
+            if rate_limit.get("per_minute"):
+                self._refill()
+                self._set_rate(rate_limit["per_minute"])
+            if rate_limit.get("per_day") is not None:
+                self.per_day = rate_limit["per_day"]
+            if rate_limit.get("remaining_today") is not None:
+                self.remaining_today = rate_limit["remaining_today"]
+            self.refreshed_at = time.monotonic()
+
+    def refresh(self):
+        """从余额接口拉取最新配额,失败时保留原有配额"""
+        self.refreshed_at = time.monotonic()
+        try:
+            response = self.source.balance()
+            if response.status_code != 200:
+                return
+            record = normalize("balance", response.json()).details or {}
+        except Exception as e:
+            print(f"⚠️ 刷新限流配额失败: {e}")
+            return
+        self.update(record.get("rate_limit") or {})
+
+    def _refresh_due(self):
+        """到了刷新时间时返回 True 并记下刷新时间,保证同一时刻只有一个调用方去刷新"""
+        if self.source is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            due = self.refreshed_at is None or now - self.refreshed_at >= self.refresh_interval
+            if due:
+                self.refreshed_at = now
+        return due
+
+    def _maybe_refresh(self):
+        if self._refresh_due():
+            self.refresh()
+
+    def reserve(self):
+        """预定一个令牌,返回调用方需要等待的秒数"""
+        self._maybe_refresh()
+        return self._take()
+
+    def _take(self):
+        with self._lock:
+            if self.remaining_today is not None:
+                if self.remaining_today <= 0:
+                    raise DailyQuotaExceeded(f"今日请求次数已用完(每日上限 {self.per_day})")
+                self.remaining_today -= 1
+
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+            self.requests += 1
+            if wait > 0:
+                self.waited += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def available_in(self):
+        """下一个令牌可用前还需等待的秒数,不消耗令牌;今日配额用完时返回 None"""
+        with self._lock:
+            if self.remaining_today is not None and self.remaining_today <= 0:
+                return None
+            self._refill()
+            return max(0.0, (1 - self._tokens) / self._rate)
+
+    def acquire(self):
+        """同步获取令牌,必要时阻塞等待"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """异步获取令牌,刷新配额和等待期间都不阻塞事件循环"""
+        if self._refresh_due():
+            await asyncio.to_thread(self.refresh)
+        wait = self._take()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def throttled(self, retry_after=None):
+        """收到 429 时调用:清空令牌,让所有调用方一起暂停"""
+        with self._lock:
+            self._refill()
+            pause = retry_after if retry_after is not None else 60.0 / self.per_minute
+            self._tokens = min(self._tokens, 0.0) - pause * self._rate
+
+    def stats(self):
+        """等待计数,用于观察限流造成的排队时间"""
+        return {
+            "requests": self.requests,
+            "waited": self.waited,
+            "total_wait": round(self.total_wait, 3),
+            "max_wait": round(self.max_wait, 3),
+            "avg_wait": round(self.total_wait / self.requests, 3) if self.requests else 0.0,
+            "per_minute": self.per_minute,
+            "remaining_today": self.remaining_today,
+        }
@@ -0,0 +1,210 @@
+"""统一的响应归一化
+
+实际接口与文档的响应格式不一致(response.success / response.data.imageUrls
+vs. 顶层 status / images),这里把各平台的创建、任务查询、余额、消费记录、
+上传响应统一转换为 NormalizedResult。
+
+每种格式(shape)对应一个直接按字段取值的函数;任务查询按 response 字段的值
+判断格式(response 是对象时为实际接口格式,否则按文档格式),不缓存判断结果:
+同一平台的响应在不同阶段可能是 "response": null 或对象。
+"""
+
+from enum import Enum
+
+
+class TaskStatus(str, Enum):
+    PENDING = "pending"
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMEOUT = "timeout"
+
+    @property
+    def terminal(self):
+        return self in TERMINAL
+
+
+TERMINAL = frozenset({TaskStatus.SUCCEEDED, TaskStatus.FAILED, TaskStatus.CANCELLED, TaskStatus.TIMEOUT})
+STATUS_VALUES = {status.value: status for status in TaskStatus}
+
+
+class NormalizedResult:
+    """归一化后的响应"""
+
+    __slots__ = ("endpoint", "platform", "shape", "status", "task_id", "trace_id",
+                 "asset_urls", "cost_cents", "error_code", "error_message", "details", "raw")
+
+    def __init__(self, endpoint, platform, shape, status, task_id=None, trace_id=None,
+                 asset_urls=(), cost_cents=None, error_code=None, error_message=None,
+                 details=None, raw=None):
+        self.endpoint = endpoint
+        self.platform = platform
+        self.shape = shape
+        self.status = status
+        self.task_id = task_id
+        self.trace_id = trace_id
+        self.asset_urls = asset_urls
+        self.cost_cents = cost_cents
+        self.error_code = error_code
+        self.error_message = error_message
+        self.details = details
+        self.raw = raw
+
+    @property
+    def ok(self):
+        """没有错误码,且任务已成功或仍在进行中;失败、取消和超时都不算"""
+        return (self.status is TaskStatus.SUCCEEDED or not self.status.terminal) and self.error_code is None
+
+    def to_dict(self):
+        return {
+            "endpoint": self.endpoint,
+            "platform": self.platform,
+            "status": self.status.value,
+            "task_id": self.task_id,
+            "trace_id": self.trace_id,
+            "asset_urls": list(self.asset_urls),
+            "cost_cents": self.cost_cents,
+            "error_code": self.error_code,
+            "error_message": self.error_message,
+        }
+
+    def __repr__(self):
+        return (f"NormalizedResult({self.endpoint}/{self.platform}: {self.status.value}, "
+                f"task_id={self.task_id}, assets={len(self.asset_urls)})")
+
+
+# ---------- 任务查询 ----------
+
+SUCCEEDED = TaskStatus.SUCCEEDED
+FAILED = TaskStatus.FAILED
+PROCESSING = TaskStatus.PROCESSING
+
+NESTED_ASSET_KEYS = ("imageUrls", "videoUrl", "videoUrls", "audioUrls", "audioUrl")
+DOC_ASSET_KEYS = ("images", "video", "music")
+
+
+def _collect_urls(data, keys):
+    urls = []
+    for key in keys:
+        value = data.get(key)
+        if not value:
+            continue
+        if isinstance(value, str):
+            urls.append(value)
+        elif isinstance(value, dict):
+            if value.get("url"):
+                urls.append(value["url"])
+        else:
+            for item in value:
+                url = item.get("url") if isinstance(item, dict) else item
+                if url:
+                    urls.append(url)
+    return tuple(urls)
+
+
+def _split_error(error):
+    if isinstance(error, dict):
+        return error.get("code"), error.get("message")
+    if error:
+        return None, str(error)
+    return None, None
+
+
+def _task_nested(obj, platform):
+    """实际接口:嵌套的 response.success / response.data"""
+    response = obj["response"]
+    success = response.get("success")
+    assets = ()
+    if success is True:
+        status = SUCCEEDED
+        data = response.get("data")
+        if isinstance(data, dict):
+            assets = _collect_urls(data, NESTED_ASSET_KEYS)
+    elif success is False:
+        status = FAILED
+    else:
+        status = STATUS_VALUES.get(obj.get("status")) or (FAILED if obj.get("finished_at") else PROCESSING)
+    code, message = _split_error(response.get("error"))
+    return NormalizedResult("tasks", platform, "nested", status, obj.get("id") or response.get("task_id"),
+                            obj.get("trace_id"), assets, None, code, message, None, obj)
+
+
+def _task_doc(obj, platform):
+    """文档格式:顶层 status / images / video / music;带错误码或 success: false 的响应为失败"""
+    code, message = _split_error(obj.get("error"))
+    status = STATUS_VALUES.get(obj.get("status"))
+    if status is None or not status.terminal:
+        status = FAILED if code is not None or obj.get("success") is False else status or PROCESSING
+    assets = _collect_urls(obj, DOC_ASSET_KEYS) if status is SUCCEEDED else ()
+    return NormalizedResult("tasks", platform, "doc", status, obj.get("task_id"),
+                            obj.get("trace_id"), assets, None, code, message, None, obj)
+
+
+# ---------- 创建 / 余额 / 消费记录 / 上传 ----------
+# 这些接口都使用 {success, data: [...], trace_id} 包装
+
+
+def _first_record(obj):
+    data = obj.get("data")
+    return data[0] if isinstance(data, list) and data and isinstance(data[0], dict) else None
+
+
+def _envelope_status(obj, code):
+    return FAILED if code is not None or obj.get("success") is False else SUCCEEDED
+
+
+def _create(obj, platform):
+    code, message = _split_error(obj.get("error"))
+    task_id = obj.get("task_id")
+    # 注意 data: [] 不代表有结果,只有拿到 task_id 才算创建成功
+    status = TaskStatus.PENDING if task_id and _envelope_status(obj, code) is SUCCEEDED else FAILED
+    return NormalizedResult("create", platform, "create", status, task_id, obj.get("trace_id"),
+                            (), None, code, message, None, obj)
+
+
+def _balance(obj, platform):
+    code, message = _split_error(obj.get("error"))
+    record = _first_record(obj) or {}
+    cost = (record.get("usage_today") or {}).get("cost_cents")
+    return NormalizedResult("balance", platform, "balance", _envelope_status(obj, code), None,
+                            obj.get("trace_id"), (), cost, code, message, record, obj)
+
+
+def _consumption(obj, platform):
+    code, message = _split_error(obj.get("error"))
+    records = (_first_record(obj) or {}).get("records") or []
+    cost = sum(r.get("cost_cents") or 0 for r in records)
+    return NormalizedResult("consumption", platform, "consumption", _envelope_status(obj, code), None,
+                            obj.get("trace_id"), (), cost, code, message, records, obj)
+
+
+def _upload(obj, platform):
+    code, message = _split_error(obj.get("error"))
+    record = _first_record(obj) or {}
+    assets = (record["url"],) if record.get("url") else ()
+    return NormalizedResult("upload", platform, "upload", _envelope_status(obj, code), None,
+                            obj.get("trace_id"), assets, None, code, message, record, obj)
+
+
+ENVELOPE_SHAPES = {
+    "create": _create,
+    "balance": _balance,
+    "consumption": _consumption,
+    "upload": _upload,
+}
+
+
+def normalize_task(result, platform=None):
+    """归一化任务查询响应"""
+    if isinstance(result.get("response"), dict):
+        return _task_nested(result, platform)
+    return _task_doc(result, platform)
+
+
+def normalize(endpoint, result, platform=None):
+    """归一化任意接口的响应,endpoint 为 create / tasks / balance / consumption / upload"""
+    if endpoint == "tasks":
+        return normalize_task(result, platform)
+    return ENVELOPE_SHAPES[endpoint](result, platform)
@@ -0,0 +1,382 @@
+"""生成任务的内容寻址结果缓存
+
+按 平台 + 接口类型 + 归一化后的请求参数 计算 sha256 作为缓存键:
+- 已有未过期的成功结果时直接返回,不再提交(不重复扣费)
+- 相同请求正在执行时,后来的调用等待并共享同一个上游 task_id,而不是各自提交
+- 内存层按条目数做 LRU;磁盘层每个结果一个 JSON 文件,超过总字节数上限时按最近使用时间淘汰
+- 已提交未完成的任务以 pending 状态落盘,脚本重跑时继续轮询原任务;
+  pending 条目记录着已扣费的 task_id,默认不过期、也不参与磁盘淘汰
+
+用法:
+    python scripts/result_cache.py stats
+    python scripts/result_cache.py clear --expired
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from api_client import get_client
+from response_normalizer import normalize, normalize_task
+from task_poller import INTERVALS, poll_all, poll_task
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_cache")
+# 结果里的资源 URL 不保证长期有效,成功结果默认只缓存一天
+DEFAULT_TTL = 24 * 3600
+# pending 条目默认永不过期:过期后重跑会重新提交,重复扣费
+PENDING_TTL = None
+INT_FIELDS = {"count", "duration"}
+DEFAULT_ACTIONS = {"images": "generate", "videos": "text2video"}
+
+
+class SubmitError(Exception):
+    """任务提交失败"""
+
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+def normalize_payload(kind, payload):
+    """去掉空值、统一空白和数值类型,补上默认 action,使等价请求得到相同的键"""
+    normalized = {}
+    for key, value in payload.items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split()) if key == "prompt" else value.strip()
+        if key in INT_FIELDS:
+            value = int(value)
+        normalized[key] = value
+    if kind in DEFAULT_ACTIONS:
+        normalized.setdefault("action", DEFAULT_ACTIONS[kind])
+    return normalized
+
+
+def request_key(platform, kind, payload):
+    body = json.dumps([platform, kind, normalize_payload(kind, payload)], sort_keys=True,
+                      ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """两级结果缓存: 内存 LRU + 磁盘 JSON 文件"""
+
+    def __init__(self, directory=DEFAULT_DIR, ttl=DEFAULT_TTL, pending_ttl=PENDING_TTL,
+                 max_entries=256, max_disk_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0,
+                         "expired": 0, "evictions": 0}
+        self._lock = threading.RLock()
+        self._disk_bytes = sum(size for _, _, size in self._disk_files()) if directory else 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _disk_files(self):
+        """磁盘上的缓存文件 (路径, 修改时间, 大小)"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files.append((path, stat.st_mtime, stat.st_size))
+        return files
+
+    def _expired(self, entry, now=None):
+        ttl = self.ttl if entry["status"] == "succeeded" else self.pending_ttl
+        return ttl is not None and (now or time.time()) - entry["stored_at"] >= ttl
+
+    def get(self, key):
+        """返回未过期的条目(成功结果或 pending 任务),没有时返回 None"""
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if not self._expired(entry):
+                    self.memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry
+                self.counters["expired"] += 1
+                self.discard(key)
+                self.counters["misses"] += 1
+                return None
+
+            entry = self._read_disk(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if self._expired(entry):
+                self.counters["expired"] += 1
+                self.discard(key)
+                self.counters["misses"] += 1
+                return None
+            # 更新修改时间,磁盘淘汰按最近使用排序
+            os.utime(self._path(key))
+            self.counters["disk_hits"] += 1
+            self._remember(key, entry)
+            return entry
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def put(self, key, entry):
+        entry = {**entry, "key": key, "stored_at": time.time()}
+        with self._lock:
+            self._remember(key, entry)
+            self.counters["stores"] += 1
+            if not self.directory:
+                return entry
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, path)
+            self._disk_bytes += os.path.getsize(path) - old_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+        return entry
+
+    def _evict_disk(self):
+        """删除最久未使用的成功结果,直到总大小降到上限的 90%;pending 条目不删"""
+        files = sorted(self._disk_files(), key=lambda item: item[1])
+        total = sum(size for _, _, size in files)
+        target = self.max_disk_bytes * 0.9
+        for path, _, size in files:
+            if total <= target:
+                break
+            entry = self._read_disk(os.path.basename(path)[:-len(".json")])
+            if entry is not None and entry["status"] == "pending":
+                continue
+            os.remove(path)
+            self.memory.pop(os.path.basename(path)[:-len(".json")], None)
+            total -= size
+            self.counters["evictions"] += 1
+        self._disk_bytes = total
+
+    def discard(self, key):
+        with self._lock:
+            self.memory.pop(key, None)
+            if self.directory and os.path.exists(self._path(key)):
+                self._disk_bytes -= os.path.getsize(self._path(key))
+                os.remove(self._path(key))
+
+    def clear(self, expired_only=False):
+        """清空缓存(或只清理过期条目),返回删除的磁盘条目数"""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            for path, _, _ in self._disk_files():
+                key = os.path.basename(path)[:-len(".json")]
+                entry = self._read_disk(key)
+                if expired_only and entry is not None and not self._expired(entry, now):
+                    continue
+                self.discard(key)
+                removed += 1
+            if not expired_only:
+                self.memory.clear()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "memory_entries": len(self.memory), "disk_bytes": self._disk_bytes}
+
+
+class CachedSubmitter:
+    """带结果缓存和在途合并的任务提交
+
+    submit / submit_async 返回缓存条目的副本,附加 source 字段:
+    cache(命中缓存)、coalesced(共享同时进行的相同请求)、
+    resumed(继续轮询之前提交的任务)、submitted(新提交)。
+    on_submit: 新提交成功后、开始轮询前以 pending 条目调用,用于调用方自己记录已扣费的任务
+    """
+
+    def __init__(self, client=None, cache=None, max_wait=600, intervals=None):
+        self.client = client or get_client()
+        self.cache = cache if cache is not None else ResultCache()
+        self.max_wait = max_wait
+        self.intervals = {**INTERVALS, **(intervals or {})}
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "resumed": 0}
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def _claim(self, key):
+        """返回 (动作, 值): hit 缓存条目 / wait 在途 Future / own 新建的 Future 和 pending 条目"""
+        with self._lock:
+            # 先看在途请求:合并的调用不查缓存,也不计入缓存未命中
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                return "wait", future
+            entry = self.cache.get(key)
+            if entry is not None and entry["status"] == "succeeded":
+                self.counters["hits"] += 1
+                return "hit", entry
+            self.counters["misses"] += 1
+            future = self._inflight[key] = Future()
+            return "own", (future, entry)
+
+    def _create(self, key, platform, kind, payload):
+        response = self.client.create_task(platform, kind, payload)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"error": response.text}
+        created = normalize("create", body, platform)
+        if response.status_code != 200 or not created.ok:
+            raise SubmitError(f"{platform}/{kind} 提交失败: HTTP {response.status_code} "
+                              f"{created.error_message or response.text[:200]}",
+                              response.status_code, body)
+        return self.cache.put(key, {"status": "pending", "platform": platform, "kind": kind,
+                                    "task_id": created.task_id, "trace_id": created.trace_id})
+
+    def _finish(self, key, pending, poll):
+        normalized = normalize_task(poll.result, poll.platform)
+        if poll.status == "succeeded":
+            entry = self.cache.put(key, {**pending, "status": "succeeded",
+                                         "trace_id": normalized.trace_id or pending.get("trace_id"),
+                                         "asset_urls": list(normalized.asset_urls), "result": poll.result})
+        else:
+            if not poll.local_timeout:
+                # 服务端返回的终态(失败、取消、超时)都不缓存,下次重新提交;
+                # 只有本地等待超时时任务可能仍在处理,保留 pending,重跑时继续轮询
+                self.cache.discard(key)
+            entry = {**pending, "status": poll.status, "error": normalized.error_message,
+                     "result": poll.result}
+        return {**entry, "polls": poll.polls, "elapsed": poll.elapsed, "local_timeout": poll.local_timeout}
+
+    def _owned(self, key, future, run):
+        try:
+            result = run()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def submit(self, platform, kind, payload, on_submit=None):
+        """同步提交并等待结果"""
+        key = request_key(platform, kind, payload)
+        action, value = self._claim(key)
+        if action == "hit":
+            return {**value, "source": "cache"}
+        if action == "wait":
+            return {**value.result(), "source": "coalesced"}
+        future, pending = value
+
+        def run():
+            source = "resumed" if pending else "submitted"
+            if pending:
+                self.counters["resumed"] += 1
+            entry = pending
+            if entry is None:
+                entry = self._create(key, platform, kind, payload)
+                if on_submit is not None:
+                    on_submit(entry)
+            poll = poll_all([(platform, entry["task_id"])], client=self.client,
+                            intervals=self.intervals, max_wait=self.max_wait)[0]
+            return {**self._finish(key, entry, poll), "source": source}
+
+        return self._owned(key, future, run)
+
+    async def submit_async(self, platform, kind, payload, submit_semaphore=None, poll_semaphore=None,
+                           on_submit=None):
+        """在事件循环中提交并等待结果,两个信号量分别限制同时提交数和同时在途的查询数"""
+        key = request_key(platform, kind, payload)
+        action, value = self._claim(key)
+        if action == "hit":
+            return {**value, "source": "cache"}
+        if action == "wait":
+            return {**await asyncio.wrap_future(value), "source": "coalesced"}
+        future, pending = value
+
+        async def run():
+            source = "resumed" if pending else "submitted"
+            if pending:
+                self.counters["resumed"] += 1
+            entry = pending
+            if entry is None:
+                async with submit_semaphore or asyncio.Semaphore(1):
+                    entry = await asyncio.to_thread(self._create, key, platform, kind, payload)
+                if on_submit is not None:
+                    on_submit(entry)
+            poll = await poll_task(self.client, platform, entry["task_id"], poll_semaphore,
+                                   self.intervals, max_wait=self.max_wait)
+            return {**self._finish(key, entry, poll), "source": source}
+
+        try:
+            result = await run()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        return {**self.counters, **{f"cache_{k}": v for k, v in self.cache.stats().items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成任务结果缓存")
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="缓存条目数和占用空间")
+    clear_parser = sub.add_parser("clear", help="清空缓存")
+    clear_parser.add_argument("--expired", action="store_true", help="只清理过期条目")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.dir)
+    if args.command == "clear":
+        print(f"已删除 {cache.clear(expired_only=args.expired)} 条缓存")
+        return
+    counts = {}
+    for path, _, _ in cache._disk_files():
+        entry = cache._read_disk(os.path.basename(path)[:-len(".json")])
+        if entry is None:
+            continue
+        state = "expired" if cache._expired(entry) else entry["status"]
+        label = (entry.get("platform"), state)
+        counts[label] = counts.get(label, 0) + 1
+    for (platform, state), n in sorted(counts.items()):
+        print(f"{platform:<10} {state:<10} {n}")
+    print(f"磁盘占用: {cache.stats()['disk_bytes'] / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""基于 SQLite 的本地任务台账
+
+记录每次提交和轮询结果,替代每次运行都被覆盖的 api_response*.json。
+tasks 表按 task_id 主键,并在 platform / status / created_at 上建索引;
+events 表保留每个任务的提交和状态变化历史。
+创建和查询响应里没有费用,tasks.cost_cents 只由 consumption_sync 从消费记录回填。
+
+用法:
+    python scripts/task_ledger.py list --platform kling --unfinished
+    python scripts/task_ledger.py resume            # 重启后只轮询未结束的任务
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from rate_limiter import DailyQuotaExceeded
+from response_normalizer import TERMINAL, normalize_task
+from task_poller import poll_tasks
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "task_ledger.db")
+TERMINAL_VALUES = tuple(sorted(status.value for status in TERMINAL))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id     TEXT PRIMARY KEY,
+    platform    TEXT NOT NULL,
+    kind        TEXT,
+    status      TEXT NOT NULL,
+    job_id      TEXT,
+    trace_id    TEXT,
+    request     TEXT,
+    result      TEXT,
+    asset_urls  TEXT,
+    cost_cents  INTEGER,
+    polls       INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_platform_status ON tasks (platform, status);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at);
+
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY,
+    task_id     TEXT NOT NULL,
+    event       TEXT NOT NULL,
+    status      TEXT,
+    detail      TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_task_id ON events (task_id);
+"""
+
+TASK_COLUMNS = ("task_id", "platform", "kind", "status", "job_id", "trace_id", "request",
+                "result", "asset_urls", "cost_cents", "polls", "created_at", "updated_at")
+
+
+def _dumps(value):
+    return None if value is None else json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class TaskLedger:
+    """任务台账;连接可跨线程使用,写操作串行化"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def record_submission(self, task_id, platform, kind=None, request=None, job_id=None, trace_id=None):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO tasks (task_id, platform, kind, status, job_id, trace_id, request,"
+                " created_at, updated_at) VALUES (?, ?, ?, 'pending', ?, ?, ?, ?, ?)",
+                (task_id, platform, kind, job_id, trace_id, _dumps(request), now, now))
+            self.conn.execute(
+                "INSERT INTO events (task_id, event, status, created_at) VALUES (?, 'submitted', 'pending', ?)",
+                (task_id, now))
+
+    def record_poll(self, task_id, status, result=None, asset_urls=None, trace_id=None, polls=1):
+        """记录一次(或合并的多次)轮询结果;只有终态才保存完整响应"""
+        now = time.time()
+        terminal = status in TERMINAL_VALUES
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE tasks SET status = ?, polls = polls + ?, updated_at = ?,"
+                " trace_id = COALESCE(trace_id, ?),"
+                " result = CASE WHEN ? THEN ? ELSE result END,"
+                " asset_urls = COALESCE(?, asset_urls)"
+                " WHERE task_id = ?",
+                (status, polls, now, trace_id, terminal, _dumps(result),
+                 _dumps(list(asset_urls)) if asset_urls else None, task_id))
+            self.conn.execute(
+                "INSERT INTO events (task_id, event, status, created_at) VALUES (?, 'poll', ?, ?)",
+                (task_id, status, now))
+
+    def record_poll_result(self, poll):
+        """记录 task_poller 的 PollResult
+
+        轮询器在本地等待超时(local_timeout)时任务在服务端可能仍在处理,
+        按最后查到的状态记录;一次都没查到时保留台账里原有的状态,保证下次 resume 还会继续轮询。
+        """
+        normalized = normalize_task(poll.result, poll.platform) if poll.result else None
+        status = poll.status
+        if poll.local_timeout:
+            if normalized is not None:
+                status = normalized.status.value
+            else:
+                row = self.get(poll.task_id)
+                status = row["status"] if row else "pending"
+        self.record_poll(poll.task_id, status, poll.result,
+                         normalized.asset_urls if normalized else None,
+                         normalized.trace_id if normalized else None, polls=poll.polls)
+        return normalized
+
+    def bulk_insert(self, rows, batch_size=5000):
+        """批量写入任务行(dict,键为 TASK_COLUMNS 的子集),每 batch_size 行一个事务"""
+        placeholders = ", ".join("?" for _ in TASK_COLUMNS)
+        sql = (f"INSERT OR REPLACE INTO tasks ({', '.join(TASK_COLUMNS)}) VALUES ({placeholders})")
+        now = time.time()
+        batch = []
+        inserted = 0
+
+        def flush():
+            with self._lock, self.conn:
+                self.conn.executemany(sql, batch)
+
+        for row in rows:
+            batch.append((
+                row["task_id"], row["platform"], row.get("kind"), row.get("status", "pending"),
+                row.get("job_id"), row.get("trace_id"), _dumps(row.get("request")),
+                _dumps(row.get("result")), _dumps(row.get("asset_urls")), row.get("cost_cents"),
+                row.get("polls", 0), row.get("created_at", now), row.get("updated_at", now),
+            ))
+            if len(batch) >= batch_size:
+                flush()
+                inserted += len(batch)
+                batch = []
+        if batch:
+            flush()
+            inserted += len(batch)
+        return inserted
+
+    def get(self, task_id):
+        row = self.conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return dict(row) if row else None
+
+    def query(self, platform=None, status=None, unfinished=False, since=None, limit=None):
+        """按平台 / 状态 / 创建时间筛选任务,按创建时间倒序返回"""
+        clauses, params = [], []
+        if platform:
+            clauses.append("platform = ?")
+            params.append(platform)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if unfinished:
+            clauses.append(f"status NOT IN ({', '.join('?' for _ in TERMINAL_VALUES)})")
+            params.extend(TERMINAL_VALUES)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        sql = "SELECT * FROM tasks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def unfinished(self, platform=None):
+        """未结束任务的 (platform, task_id),供轮询器续跑"""
+        return [(row["platform"], row["task_id"]) for row in self.query(platform=platform, unfinished=True)]
+
+    def status_counts(self, platform=None):
+        sql = "SELECT platform, status, COUNT(*) AS n FROM tasks"
+        params = ()
+        if platform:
+            sql += " WHERE platform = ?"
+            params = (platform,)
+        sql += " GROUP BY platform, status"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def history(self, task_id):
+        return [dict(row) for row in self.conn.execute(
+            "SELECT event, status, detail, created_at FROM events WHERE task_id = ? ORDER BY id", (task_id,))]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def resume(ledger, platform=None, **poll_options):
+    """重新轮询台账中所有未结束的任务,并把结果写回台账;今日配额用完时停止,其余任务留待下次"""
+    tasks = ledger.unfinished(platform)
+    print(f"未结束任务: {len(tasks)}")
+    finished = 0
+    try:
+        async for poll in poll_tasks(tasks, **poll_options):
+            ledger.record_poll_result(poll)
+            finished += 1
+            mark = "⏸️" if poll.local_timeout else "✅" if poll.status == "succeeded" else "❌"
+            print(f"{mark} {poll.platform}/{poll.task_id}: {poll.status}")
+    except DailyQuotaExceeded as e:
+        print(f"⏸️ {e},其余 {len(tasks) - finished} 个任务留待下次 resume")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地任务台账")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = sub.add_parser("list", help="列出任务")
+    list_parser.add_argument("--platform")
+    list_parser.add_argument("--status")
+    list_parser.add_argument("--unfinished", action="store_true")
+    list_parser.add_argument("--limit", type=int, default=50)
+
+    sub.add_parser("stats", help="按平台和状态统计")
+
+    resume_parser = sub.add_parser("resume", help="轮询未结束的任务直到完成")
+    resume_parser.add_argument("--platform")
+    resume_parser.add_argument("--concurrency", type=int, default=10)
+    resume_parser.add_argument("--max-wait", type=float, default=900)
+    args = parser.parse_args()
+
+    with TaskLedger(args.db) as ledger:
+        if args.command == "list":
+            for row in ledger.query(args.platform, args.status, args.unfinished, limit=args.limit):
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["created_at"]))
+                print(f"{created}  {row['platform']:<10} {row['status']:<10} {row['task_id']}")
+        elif args.command == "stats":
+            for row in ledger.status_counts():
+                print(f"{row['platform']:<10} {row['status']:<10} {row['n']}")
+        else:
+            asyncio.run(resume(ledger, args.platform, concurrency=args.concurrency, max_wait=args.max_wait))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""基于 asyncio 的并发任务轮询
+
+一次轮询多个 (platform, task_id),通过信号量限制同时在途的查询数,
+每个任务按当前状态自适应地拉长轮询间隔,任务一结束就产出结果。
+
+底层仍使用 api_client 的共享 Session(在线程中执行),连接池大小应不小于并发上限。
+poll_tasks 使用自己的线程池(线程数等于并发上限),不受事件循环默认线程池
+min(32, CPU 数 + 4) 个线程的限制。查询请求本身抛出的异常(读超时、连接断开)
+与非 200 响应一样处理:保持当前状态,稍后再查。
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import instrumentation
+from api_client import get_client
+from response_normalizer import normalize_task
+
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled", "timeout"}
+
+# 每种状态的 (初始间隔, 最大间隔),单位秒;排队中的任务不必查得太勤
+INTERVALS = {
+    "pending": (5.0, 30.0),
+    "queued": (5.0, 30.0),
+    "processing": (2.0, 15.0),
+}
+
+
+def task_status(result, platform=None):
+    """从任务查询响应中判断状态,兼容文档格式和实际的嵌套 response 格式"""
+    return normalize_task(result, platform).status.value
+
+
+class PollResult:
+    """单个任务的轮询结果
+
+    local_timeout: 轮询器等到 max_wait 后放弃,status 为 timeout,但任务在服务端可能仍在处理;
+    服务端自己返回的 timeout 终态此项为 False
+    """
+
+    __slots__ = ("platform", "task_id", "status", "result", "polls", "elapsed", "local_timeout")
+
+    def __init__(self, platform, task_id, status, result, polls, elapsed, local_timeout=False):
+        self.platform = platform
+        self.task_id = task_id
+        self.status = status
+        self.result = result
+        self.polls = polls
+        self.elapsed = elapsed
+        self.local_timeout = local_timeout
+
+    def __repr__(self):
+        return (f"PollResult({self.platform}/{self.task_id}: {self.status}, "
+                f"polls={self.polls}, elapsed={self.elapsed:.1f}s)")
+
+
+async def poll_task(client, platform, task_id, semaphore=None, intervals=None,
+                    growth=1.5, max_wait=600, executor=None):
+    """轮询单个任务直到结束或超过 max_wait,返回 PollResult
+
+    executor: 执行查询请求的线程池,默认使用事件循环的默认线程池
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = semaphore or asyncio.Semaphore(1)
+    intervals = intervals or INTERVALS
+    start = time.monotonic()
+    polls = 0
+    status = None
+    delay = 0.0
+    result = {}
+
+    while True:
+        async with semaphore:
+            try:
+                response = await loop.run_in_executor(executor, client.query_task, platform, task_id)
+            except requests.RequestException:
+                # 读超时等异常 ApiClient 不重试,这里当作一次失败的查询
+                response = None
+        polls += 1
+
+        if response is None:
+            new_status = status or "pending"
+        elif response.status_code == 200:
+            result = response.json()
+            new_status = task_status(result, platform)
+        elif response.status_code == 404:
+            result = _json_or_text(response)
+            new_status = "failed"
+        else:
+            # 查询本身出错(限流/服务端异常)不改变任务状态,按当前间隔稍后再查
+            new_status = status or "pending"
+
+        rec = instrumentation.recorder
+        if rec is not None:
+            rec.task_status(platform, task_id, new_status)
+        elapsed = time.monotonic() - start
+        if new_status in TERMINAL_STATUSES:
+            return PollResult(platform, task_id, new_status, result, polls, elapsed)
+
+        initial, maximum = intervals.get(new_status, intervals["processing"])
+        delay = initial if new_status != status else min(delay * growth, maximum)
+        status = new_status
+
+        if elapsed + delay > max_wait:
+            return PollResult(platform, task_id, "timeout", result, polls, elapsed, local_timeout=True)
+        await asyncio.sleep(delay)
+
+
+def _json_or_text(response):
+    try:
+        return response.json()
+    except ValueError:
+        return {"error": response.text}
+
+
+async def poll_tasks(tasks, client=None, concurrency=10, intervals=None,
+                     growth=1.5, max_wait=600):
+    """并发轮询多个任务,按完成顺序逐个产出 PollResult
+
+    tasks: 可迭代的 (platform, task_id)
+    concurrency: 同时在途的查询请求上限
+    intervals: 覆盖 INTERVALS 中各状态的 (初始, 最大) 间隔
+    max_wait: 单个任务最长等待时间,超过后以 timeout 状态返回(local_timeout 为 True)
+    """
+    client = client or get_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    intervals = {**INTERVALS, **(intervals or {})}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = [
+            asyncio.ensure_future(poll_task(client, platform, task_id, semaphore, intervals, growth,
+                                            max_wait, executor))
+            for platform, task_id in tasks
+        ]
+        try:
+            for future in asyncio.as_completed(pending):
+                yield await future
+        finally:
+            # 调用方提前停止(例如今日配额用完)时取消其余轮询,并取回它们的异常
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def poll_all(tasks, **options):
+    """同步调用入口:轮询全部任务,返回按完成顺序排列的结果列表"""
+
+    async def collect():
+        return [result async for result in poll_tasks(tasks, **options)]
+
+    return asyncio.run(collect())
+
+
+def wait_for_task(platform, task_id, **options):
+    """同步等待单个任务结束"""
+    return poll_all([(platform, task_id)], **options)[0]
@@ -1,9 +1,8 @@
-import requests
 import json
 import time
 
-API_KEY = "sk-VVcGEpwwm4Thtra20N4ppN48xQJ4A7lh"
-BASE_URL = "https://openapi.ai-studio.me"
+from api_client import get_client
+from response_normalizer import normalize
 
 def test_video_generation():
     """测试视频生成接口(文生视频)"""
@@ -11,11 +10,8 @@ def test_video_generation():
     print("测试 1: 视频生成接口 - 文生视频")
     print("=" * 80)
     
-    url = f"{BASE_URL}/api/kling/videos"
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
+    client = get_client()
+    url = client.url("/api/kling/videos")
     
     # 按文档格式
     payload = {
@@ -29,16 +25,17 @@ def test_video_generation():
     print(f"请求体: {json.dumps(payload, indent=2, ensure_ascii=False)}")
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = client.create_task("kling", "videos", payload)
         print(f"\n响应状态码: {response.status_code}")
         print(f"响应内容: {response.text}")
         
         if response.status_code == 200:
             data = response.json()
-            task_id = data.get("task_id")
-            if task_id:
-                print(f"✅ 任务创建成功: {task_id}")
-                return {"success": True, "task_id": task_id, "response": data}
+            # data: [] 不代表成功,以归一化后是否拿到 task_id 为准
+            result = normalize("create", data, "kling")
+            if result.ok:
+                print(f"✅ 任务创建成功: {result.task_id}")
+                return {"success": True, "task_id": result.task_id, "response": data}
             else:
                 print(f"❌ 响应中没有 task_id")
                 return {"success": False, "error": "No task_id", "response": data}
@@ -54,17 +51,14 @@ def test_account_balance():
     print("测试 2: 账户余额查询")
     print("=" * 80)
     
-    url = f"{BASE_URL}/api/account/balance"
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
+    client = get_client()
+    url = client.url("/api/account/balance")
     
     print(f"\n请求 URL: {url}")
     print("请求体: 无(文档说无需请求体)")
     
     try:
-        response = requests.post(url, headers=headers)
+        response = client.balance()
         print(f"\n响应状态码: {response.status_code}")
         
         if response.status_code == 200:
@@ -75,7 +69,7 @@ def test_account_balance():
             with open("scripts/balance_response.json", "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
             
-            return {"success": True, "response": data}
+            return {"success": normalize("balance", data).ok, "response": data}
         else:
             print(f"响应内容: {response.text}")
             return {"success": False, "error": response.text}
@@ -89,11 +83,8 @@ def test_file_upload():
     print("测试 3: 文件上传接口")
     print("=" * 80)
     
-    url = f"{BASE_URL}/api/upload/file"
-    headers = {
-        "Authorization": f"Bearer {API_KEY}"
-        # 注意: multipart/form-data 不需要手动设置 Content-Type
-    }
+    client = get_client()
+    url = client.url("/api/upload/file")
     
     print(f"\n请求 URL: {url}")
     print("说明: 由于没有实际图片文件,此测试仅验证接口是否存在")
@@ -105,13 +96,15 @@ def test_file_upload():
     }
     
     try:
-        response = requests.post(url, headers=headers, files=files)
+        # 注意: multipart/form-data 不需要手动设置 Content-Type
+        response = client.upload_file(files)
         print(f"\n响应状态码: {response.status_code}")
         print(f"响应内容: {response.text}")
         
         if response.status_code == 200:
             data = response.json()
-            return {"success": True, "response": data}
+            result = normalize("upload", data)
+            return {"success": result.ok and bool(result.asset_urls), "response": data}
         else:
             return {"success": False, "error": response.text, "status_code": response.status_code}
     except Exception as e:
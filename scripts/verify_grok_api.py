@@ -1,15 +1,11 @@
-import requests
 import json
-import time
+
+from api_client import get_client
+from result_cache import CachedSubmitter, SubmitError
 
 def verify_grok_api():
-    url = "https://openapi.ai-studio.me/api/grok/images"
-    api_key = "sk-VVcGEpwwm4Thtra20N4ppN48xQJ4A7lh"
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    client = get_client()
+    url = client.url("/api/grok/images")
     
     # Strictly following the doc: No 'action' field -> FAILED (400)
     # Adding 'action' based on error feedback
@@ -22,68 +18,43 @@ def verify_grok_api():
     }
     
     print(f"Sending Request to: {url}")
-    print(f"Headers: {json.dumps(headers, ensure_ascii=False)}")
     print(f"Payload: {json.dumps(payload, ensure_ascii=False)}")
     
+    # Identical payloads reuse the cached result instead of paying for a new task
+    # (delete scripts/.result_cache to force a fresh one)
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        
-        print(f"\nResponse Status Code: {response.status_code}")
-        print(f"Response Body: {response.text}")
-        
-        if response.status_code == 200:
-            data = response.json()
-            task_id = data.get("task_id")
-            if task_id:
-                print(f"\nTask ID received: {task_id}")
-                verify_task_status(task_id, api_key)
-            else:
-                print("\nERROR: No task_id in response")
-        else:
-            print(f"\nRequest Failed")
-
+        entry = CachedSubmitter(client, max_wait=15).submit("grok", "images", payload)
+    except SubmitError as e:
+        print(f"\nResponse Status Code: {e.status_code}")
+        print(f"Response Body: {json.dumps(e.body, ensure_ascii=False)}")
+        print(f"\nRequest Failed")
+        return
     except Exception as e:
         print(f"\nException occurred: {e}")
+        return
 
-def verify_task_status(task_id, api_key):
-    url = "https://openapi.ai-studio.me/api/grok/tasks"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {"task_id": task_id}
+    print(f"\nTask ID: {entry['task_id']} (source: {entry['source']})")
+    verify_task_status(entry)
+
+def verify_task_status(entry):
+    print(f"\n--- Task Status ---")
+    if entry["source"] == "cache":
+        print("Cached result, no new task submitted")
+    else:
+        print(f"Polled {entry['polls']} times, status: {entry['status']}")
+    result = entry["result"]
     
-    print(f"\n--- Querying Task Status ---")
-    print(f"URL: {url}")
-    print(f"Payload: {json.dumps(payload)}")
+    # Save response to JSON file
+    output_file = "scripts/api_response.json"
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"Response saved to: {output_file}")
     
-    # Poll a few times
-    for i in range(5):
-        print(f"\nPolling attempt {i+1}...")
-        try:
-            response = requests.post(url, headers=headers, json=payload)
-            print(f"Status Code: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Save response to JSON file
-                output_file = "scripts/api_response.json"
-                with open(output_file, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                print(f"Response saved to: {output_file}")
-                
-                # Check for various success indicators based on our findings
-                if data.get("status") == "succeeded":
-                    print("✅ Status is 'succeeded' (Matches Doc Standard)")
-                    return
-                if data.get("response", {}).get("success"):
-                     print("✅ Found data.response.success = true (Actual Grok Behavior)")
-                     return
-            
-            time.sleep(3)
-        except Exception as e:
-            print(f"Polling error: {e}")
+    # Check for various success indicators based on our findings
+    if result.get("status") == "succeeded":
+        print("✅ Status is 'succeeded' (Matches Doc Standard)")
+    elif result.get("response", {}).get("success"):
+        print("✅ Found data.response.success = true (Actual Grok Behavior)")
 
 if __name__ == "__main__":
     verify_grok_api()
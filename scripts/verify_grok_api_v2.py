@@ -1,16 +1,12 @@
-import requests
 import json
-import time
+
+from api_client import get_client
+from result_cache import CachedSubmitter, SubmitError
 
 def verify_grok_api():
     """完整验证流程:创建任务 -> 轮询直到成功 -> 保存完整响应"""
-    url = "https://openapi.ai-studio.me/api/grok/images"
-    api_key = "sk-VVcGEpwwm4Thtra20N4ppN48xQJ4A7lh"
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    client = get_client()
+    url = client.url("/api/grok/images")
     
     payload = {
         "action": "generate",
@@ -26,64 +22,37 @@ def verify_grok_api():
     print(f"请求 URL: {url}")
     print(f"请求体: {json.dumps(payload, indent=2, ensure_ascii=False)}")
     
+    max_wait = 90
+    # 相同请求已有成功结果时直接复用,不重新提交扣费;删除 scripts/.result_cache 可强制重新生成
+    submitter = CachedSubmitter(client, max_wait=max_wait)
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        print(f"\n响应状态码: {response.status_code}")
-        
-        if response.status_code != 200:
-            print(f"❌ 请求失败: {response.text}")
-            return
-            
-        data = response.json()
-        task_id = data.get("task_id")
-        
-        if not task_id:
-            print(f"❌ 响应中没有 task_id: {json.dumps(data, indent=2, ensure_ascii=False)}")
-            return
-            
-        print(f"✅ 任务创建成功,task_id: {task_id}")
+        entry = submitter.submit("grok", "images", payload)
+        result = entry["result"]
+        print(f"\ntask_id: {entry['task_id']}")
         
-        # 轮询任务状态直到完成
         print("\n" + "=" * 60)
         print("步骤 2: 轮询任务状态直到完成")
         print("=" * 60)
         
-        query_url = "https://openapi.ai-studio.me/api/grok/tasks"
-        max_attempts = 30
+        if entry["source"] == "cache":
+            print("♻️ 命中结果缓存,未重新提交")
+        else:
+            print(f"\n共查询 {entry['polls']} 次,耗时 {entry['elapsed']:.1f} 秒,状态: {entry['status']}")
         
-        for attempt in range(1, max_attempts + 1):
-            print(f"\n[尝试 {attempt}/{max_attempts}] 查询任务状态...")
-            time.sleep(3)
-            
-            query_response = requests.post(
-                query_url,
-                headers=headers,
-                json={"task_id": task_id}
-            )
-            
-            if query_response.status_code != 200:
-                print(f"❌ 查询失败: {query_response.text}")
-                continue
-                
-            result = query_response.json()
-            
-            # 检查是否完成
-            if result.get("status") == "succeeded":
-                print("✅ 任务完成!(标准格式: status='succeeded')")
-                save_and_analyze(result, "succeeded")
-                return
-            elif result.get("response", {}).get("success"):
-                print("✅ 任务完成!(Grok 格式: response.success=true)")
-                save_and_analyze(result, "grok_success")
-                return
-            elif result.get("status") == "failed":
-                print(f"❌ 任务失败: {json.dumps(result, indent=2, ensure_ascii=False)}")
-                return
-            else:
-                print(f"⏳ 任务处理中...")
-                
-        print(f"\n❌ 超时:轮询 {max_attempts} 次后任务仍未完成")
+        # 检查是否完成
+        if result.get("status") == "succeeded":
+            print("✅ 任务完成!(标准格式: status='succeeded')")
+            save_and_analyze(result, "succeeded")
+        elif result.get("response", {}).get("success"):
+            print("✅ 任务完成!(Grok 格式: response.success=true)")
+            save_and_analyze(result, "grok_success")
+        elif entry.get("local_timeout"):
+            print(f"\n❌ 超时:等待 {max_wait} 秒后任务仍未完成")
+        else:
+            print(f"❌ 任务失败: {json.dumps(result, indent=2, ensure_ascii=False)}")
         
+    except SubmitError as e:
+        print(f"❌ 请求失败: {e}")
     except Exception as e:
         print(f"\n❌ 异常: {e}")
 